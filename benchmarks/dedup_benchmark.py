@@ -0,0 +1,76 @@
+"""
+Time the catalog readers and the cross-catalog deduplication stage.
+
+A synthetic Kandilli catalog is re-reported by three other "agencies" (USGS
+CSV, EMSC FDSN text and QuakeML), each keeping part of the events with
+perturbed time, location and magnitude. The Kandilli months are parsed with
+`EarthquakeAnalyzer.extract_data` and merged through
+`data_prep.merge_extra_catalogs`, as `data_prep_pipeline` does. The benchmark
+reports reader and merge times per scale and how many events the merge
+recovered:
+
+    python -m benchmarks.dedup_benchmark --events 10000 100000 1000000
+"""
+import argparse
+import contextlib
+import io
+import os
+import tempfile
+import time
+
+import numpy as np
+
+from benchmarks import synthetic
+
+
+def run_scale(n_events: int, workdir: str, seed: int = 0) -> dict:
+    import modules.data_prep as data_prep
+    import modules.readers as readers
+    from modules.model import EarthquakeAnalyzer
+
+    rng = np.random.default_rng(seed)
+    scale_dir = os.path.join(workdir, f"dedup_{n_events}_{seed}")
+    os.makedirs(scale_dir, exist_ok=True)
+    kandilli_files = synthetic.generate_catalog(os.path.join(scale_dir, 'kandilli'), n_events, n_months=12, seed=seed)
+    analyzer = EarthquakeAnalyzer(download_path=os.path.join(scale_dir, 'kandilli'))
+    with contextlib.redirect_stdout(io.StringIO()):
+        kandilli = analyzer.extract_data(kandilli_files)
+    paths = {
+        'usgs': synthetic.write_usgs_csv(os.path.join(scale_dir, 'usgs.csv'), synthetic.jittered_copy(kandilli, rng)),
+        'emsc': synthetic.write_emsc_text(os.path.join(scale_dir, 'emsc.txt'), synthetic.jittered_copy(kandilli, rng)),
+        'quakeml': synthetic.write_quakeml(os.path.join(scale_dir, 'events.xml'), synthetic.jittered_copy(kandilli, rng)),
+    }
+
+    timings = {}
+    rows_in = len(kandilli)
+    for name, path in paths.items():
+        start = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            rows_in += len(readers.read_catalogs([path]))
+        timings[f"read_{name}"] = time.perf_counter() - start
+
+    # Reads the extra catalogs again and deduplicates, exactly as the pipeline does
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        unique = data_prep.merge_extra_catalogs(kandilli, list(paths.values()))
+    timings['merge_extra_catalogs'] = time.perf_counter() - start
+    return {'rows_in': rows_in, 'rows_out': len(unique), 'true_events': len(kandilli), 'timings': timings}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--events', type=int, nargs='+', default=[10_000, 100_000])
+    parser.add_argument('--workdir', default=os.path.join(tempfile.gettempdir(), 'earthquake_dedup_bench'))
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args(argv)
+
+    for n_events in args.events:
+        result = run_scale(n_events, args.workdir, args.seed)
+        print(f"{n_events} events: {result['rows_in']} rows from 4 sources -> {result['rows_out']} "
+              f"(true {result['true_events']})")
+        for stage, seconds in result['timings'].items():
+            print(f"  {stage:<24} {seconds:10.4f} s")
+
+
+if __name__ == '__main__':
+    main()
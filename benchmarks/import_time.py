@@ -0,0 +1,78 @@
+"""
+Check the import-time budget of the `modules` package.
+
+Each module is imported in a fresh interpreter so earlier imports cannot warm
+the cache. The script fails if an import exceeds its budget or if a module
+drags in part of the heavy map/notebook stack at import time:
+
+    python -m benchmarks.import_time --repeat 5
+"""
+import argparse
+import json
+import subprocess
+import sys
+
+
+# Milliseconds, measured on top of a bare interpreter start. pandas/numpy
+# dominate the data modules and are needed by every data job anyway.
+IMPORT_BUDGET_MS = {
+    'modules': 20,
+    'modules.config': 20,
+    'modules.model': 600,
+    'modules.data_prep': 600,
+    'modules.ingestion': 600,
+    'modules.catalog_stats': 600,
+    'modules.fault_graph': 600,
+    'modules.snapshot': 600,
+    'modules.visualisation': 50,
+}
+
+# Nothing in this list may be loaded by importing any module of the package
+HEAVY_MODULES = ['folium', 'branca', 'ipywidgets', 'IPython', 'scipy', 'geojson', 'requests', 'jinja2']
+
+_PROBE = """
+import json, sys, time
+start = time.perf_counter()
+import {module}
+elapsed = time.perf_counter() - start
+print(json.dumps({{'ms': elapsed * 1000, 'loaded': [m for m in {heavy!r} if m in sys.modules]}}))
+"""
+
+
+def measure(module: str, repeat: int = 3) -> dict:
+    """Best-of-`repeat` import time of `module` in a fresh interpreter"""
+    best = None
+    for _ in range(repeat):
+        out = subprocess.run([sys.executable, '-c', _PROBE.format(module=module, heavy=HEAVY_MODULES)],
+                             capture_output=True, text=True, check=True)
+        result = json.loads(out.stdout.strip().splitlines()[-1])
+        if best is None or result['ms'] < best['ms']:
+            best = result
+    return best
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--scale', type=float, default=1.0,
+                        help='multiply every budget, e.g. 2.0 on slow CI machines')
+    args = parser.parse_args(argv)
+
+    failures = 0
+    for module, budget in IMPORT_BUDGET_MS.items():
+        result = measure(module, args.repeat)
+        limit = budget * args.scale
+        status = 'ok'
+        if result['ms'] > limit:
+            status = 'OVER BUDGET'
+            failures += 1
+        if result['loaded']:
+            status = f"LOADS {', '.join(result['loaded'])}"
+            failures += 1
+        print(f"{module:<24} {result['ms']:8.1f} ms  (budget {limit:.0f} ms)  {status}")
+
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
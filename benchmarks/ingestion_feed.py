@@ -0,0 +1,162 @@
+"""
+Local stand-in for the Kandilli current-month feed, plus an ingestion latency run.
+
+The feed server serves `/{year}{month:02}.xml` and appends a few synthetic
+events every `--append-interval` seconds. It honours `If-None-Match` so the
+daemon's conditional polling can be exercised. Running the module starts the
+server and an `IngestionDaemon` against it, then reports the time from an
+event being appended to the feed to it coming out of the enrichment path:
+
+    python -m benchmarks.ingestion_feed --duration 30 --poll-interval 1
+"""
+import argparse
+import json
+import os
+import tempfile
+import threading
+import time
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+
+from benchmarks import synthetic
+
+
+class SyntheticFeed:
+    """Thread-safe, growing month of Kandilli XML events"""
+
+    def __init__(self, year: int, month: int, initial_events: int = 100, seed: int = 0):
+        self.year = year
+        self.month = month
+        self.rng = np.random.default_rng(seed)
+        self.lock = threading.Lock()
+        self.lines = []
+        self.appended_at = {}
+        self.version = 0
+        self.append(initial_events)
+
+    def append(self, n_events: int):
+        lat = self.rng.uniform(*synthetic.REGION_LAT, size=n_events)
+        lng = self.rng.uniform(*synthetic.REGION_LNG, size=n_events)
+        mag = np.clip(1.0 + self.rng.exponential(1 / np.log(10), size=n_events), 0.1, 7.5)
+        depth = self.rng.uniform(1.0, 30.0, size=n_events)
+        now = time.time()
+        stamp = datetime.now().strftime('%H:%M:%S')
+        with self.lock:
+            for la, ln, m, dp in zip(lat, lng, mag, depth):
+                # Events appended together share a timestamp; coordinates keep their keys distinct
+                seq = len(self.lines)
+                name = f"{self.year}.{self.month:02}.{1 + seq // 86400 % 28:02} {stamp}"
+                key = f"{name}|{la:.4f}|{ln:.4f}|{m:.1f}"
+                self.lines.append(
+                    f'<earhquake name="{name}" lokasyon="SYNTHETIC ({seq})" lat="{la:.4f}" '
+                    f'lng="{ln:.4f}" mag="{m:.1f}" Depth="{dp:.1f}"/>\n')
+                self.appended_at[key] = now
+            self.version += 1
+
+    def document(self):
+        with self.lock:
+            body = '<?xml version="1.0" encoding="UTF-8"?>\n<eqlist>\n' + ''.join(self.lines) + '</eqlist>\n'
+            return body.encode('utf-8'), f'"v{self.version}"'
+
+
+def make_handler(feed: SyntheticFeed):
+    class FeedHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.rstrip('/').split('/')[-1] != f"{feed.year}{feed.month:02}.xml":
+                self.send_error(404)
+                return
+            body, etag = feed.document()
+            if self.headers.get('If-None-Match') == etag:
+                self.send_response(304)
+                self.send_header('ETag', etag)
+                self.end_headers()
+                return
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/xml')
+            self.send_header('Content-Length', str(len(body)))
+            self.send_header('ETag', etag)
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    return FeedHandler
+
+
+def serve(feed: SyntheticFeed, host: str = '127.0.0.1', port: int = 0) -> ThreadingHTTPServer:
+    """Start the feed server in a background thread; port 0 picks a free port"""
+    server = ThreadingHTTPServer((host, port), make_handler(feed))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--duration', type=float, default=20.0, help='seconds to run the daemon')
+    parser.add_argument('--poll-interval', type=float, default=1.0)
+    parser.add_argument('--append-interval', type=float, default=0.5)
+    parser.add_argument('--append-events', type=int, default=5)
+    parser.add_argument('--initial-events', type=int, default=2000)
+    parser.add_argument('--faults', type=int, default=1000)
+    args = parser.parse_args(argv)
+
+    import modules.data_prep as data_prep
+    from modules.ingestion import IngestionDaemon, IngestionMetrics
+    from modules.model import EarthquakeAnalyzer
+    from modules.config import REGION_BOUNDS
+
+    now = datetime.now()
+    feed = SyntheticFeed(now.year, now.month, initial_events=args.initial_events)
+    server = serve(feed)
+    url_template = f"http://127.0.0.1:{server.server_address[1]}/{{year}}{{month:02}}.xml"
+
+    workdir = tempfile.mkdtemp(prefix='ingest_bench_')
+    fault_path = synthetic.generate_fault_geojson(os.path.join(workdir, 'faults.geojson'), args.faults)
+    features_df, _, _ = data_prep.load_faults_in_bounds(REGION_BOUNDS, fault_path)
+
+    appear_to_enriched = []
+    enriched_events = [0]
+
+    def on_batch(batch):
+        done = time.time()
+        enriched_events[0] += len(batch)
+        for key in batch['event_key']:
+            if key in feed.appended_at:
+                appear_to_enriched.append(done - feed.appended_at[key])
+
+    daemon = IngestionDaemon(features_df=features_df,
+                             analyzer=EarthquakeAnalyzer(download_path=workdir, url_template=url_template),
+                             poll_interval=args.poll_interval,
+                             state_path=os.path.join(workdir, 'state'),
+                             on_batch=on_batch)
+    # The first poll enriches the whole backlog; only later appends measure steady-state latency
+    daemon.poll_once()
+    daemon.metrics = IngestionMetrics()
+    appear_to_enriched.clear()
+
+    stop = threading.Event()
+
+    def appender():
+        while not stop.wait(args.append_interval):
+            feed.append(args.append_events)
+
+    threading.Thread(target=appender, daemon=True).start()
+    thread = daemon.start()
+    time.sleep(args.duration)
+    stop.set()
+    daemon.stop()
+    thread.join()
+    server.shutdown()
+
+    summary = daemon.metrics.summary()
+    summary['appear_to_enriched_s'] = daemon.metrics._percentiles(appear_to_enriched)
+    summary['feed_events'] = len(feed.lines)
+    summary['enriched_events'] = enriched_events[0]
+    print(json.dumps(summary, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,170 @@
+"""
+Load generator for the local query service.
+
+By default it builds a synthetic enriched catalog, serves it from a separate
+process and fires a mix of bbox, time-window, magnitude and per-fault queries
+from many concurrent keep-alive connections, reporting throughput and latency
+percentiles:
+
+    python -m benchmarks.load_generator --concurrency 200 --requests 20000
+
+Pass `--url http://host:port` to load an already running service instead.
+"""
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import tempfile
+import time
+from urllib.parse import urlsplit, quote
+
+import numpy as np
+
+from benchmarks import synthetic
+
+
+def _build_catalog(n_events: int, n_faults: int, seed: int):
+    import modules.data_prep as data_prep
+    from modules.model import EarthquakeAnalyzer
+
+    workdir = tempfile.mkdtemp(prefix='query_bench_')
+    files = synthetic.generate_catalog(os.path.join(workdir, 'catalog'), n_events, n_months=3, seed=seed)
+    fault_path = synthetic.generate_fault_geojson(os.path.join(workdir, 'faults.geojson'), n_faults, seed=seed)
+    data = EarthquakeAnalyzer(download_path=workdir).extract_data(files)
+    features_df, _, _ = data_prep.load_and_filter_faults(data, fault_path)
+    return data_prep.enrich_data(data, features_df)
+
+
+def _serve_synthetic(n_events, n_faults, seed, port_queue):
+    from modules.query_service import QueryService
+
+    service = QueryService(_build_catalog(n_events, n_faults, seed))
+    asyncio.run(service.serve(port=0, ready=port_queue.put))
+
+
+def make_targets(n: int, catalog_ids: list, seed: int = 0, distinct: int = 500) -> list:
+    """A reproducible mix of query targets; `distinct` bounds how many are unique (cache reuse)"""
+    rng = np.random.default_rng(seed)
+    pool = []
+    for i in range(distinct):
+        kind = i % 4
+        if kind == 0:
+            lat, lng = rng.uniform(*synthetic.REGION_LAT), rng.uniform(*synthetic.REGION_LNG)
+            size = rng.uniform(0.2, 2.0)
+            pool.append(f"/events?bbox={lat:.2f},{lng:.2f},{lat + size:.2f},{lng + size:.2f}&limit=100")
+        elif kind == 1:
+            day = int(rng.integers(1, 28))
+            pool.append(f"/events?start=2025-01-{day:02}&end=2025-01-{min(day + 2, 28):02}&limit=100")
+        elif kind == 2:
+            pool.append(f"/events?min_mag={rng.uniform(2.5, 4.0):.1f}&limit=100")
+        elif catalog_ids:
+            pool.append(f"/faults/{quote(str(catalog_ids[int(rng.integers(0, len(catalog_ids)))]))}")
+        else:
+            pool.append("/faults")
+    return [pool[i] for i in rng.integers(0, len(pool), size=n)]
+
+
+async def _get(reader, writer, host, target):
+    writer.write(f"GET {target} HTTP/1.1\r\nHost: {host}\r\nConnection: keep-alive\r\n\r\n".encode('latin-1'))
+    await writer.drain()
+    status = int((await reader.readline()).split()[1])
+    length = 0
+    while True:
+        line = await reader.readline()
+        if line in (b'\r\n', b''):
+            break
+        name, _, value = line.decode('latin-1').partition(':')
+        if name.lower() == 'content-length':
+            length = int(value)
+    body = await reader.readexactly(length)
+    return status, body
+
+
+async def run_load(host: str, port: int, targets: list, concurrency: int) -> dict:
+    queue = asyncio.Queue()
+    for t in targets:
+        queue.put_nowait(t)
+    latencies = []
+    errors = 0
+
+    async def worker():
+        nonlocal errors
+        reader, writer = await asyncio.open_connection(host, port)
+        try:
+            while True:
+                try:
+                    target = queue.get_nowait()
+                except asyncio.QueueEmpty:
+                    return
+                start = time.perf_counter()
+                status, _ = await _get(reader, writer, host, target)
+                latencies.append(time.perf_counter() - start)
+                if status >= 500:
+                    errors += 1
+        finally:
+            writer.close()
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+
+    lat_ms = np.asarray(latencies) * 1000
+    return {
+        'requests': len(latencies),
+        'concurrency': concurrency,
+        'errors': errors,
+        'seconds': round(elapsed, 3),
+        'throughput_rps': round(len(latencies) / elapsed, 1),
+        'p50_ms': round(float(np.percentile(lat_ms, 50)), 3),
+        'p95_ms': round(float(np.percentile(lat_ms, 95)), 3),
+        'p99_ms': round(float(np.percentile(lat_ms, 99)), 3),
+        'max_ms': round(float(lat_ms.max()), 3),
+    }
+
+
+async def _fetch_json(host, port, target):
+    reader, writer = await asyncio.open_connection(host, port)
+    try:
+        _, body = await _get(reader, writer, host, target)
+        return json.loads(body)
+    finally:
+        writer.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--url', help='query an already running service instead of starting one')
+    parser.add_argument('--events', type=int, default=20_000, help='synthetic catalog size')
+    parser.add_argument('--faults', type=int, default=500, help='synthetic fault count')
+    parser.add_argument('--requests', type=int, default=10_000)
+    parser.add_argument('--concurrency', type=int, default=200)
+    parser.add_argument('--distinct', type=int, default=500, help='number of distinct queries in the mix')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args(argv)
+
+    process = None
+    if args.url:
+        url = urlsplit(args.url)
+        host, port = url.hostname, url.port
+    else:
+        port_queue = multiprocessing.Queue()
+        process = multiprocessing.Process(target=_serve_synthetic,
+                                          args=(args.events, args.faults, args.seed, port_queue), daemon=True)
+        process.start()
+        host, port = '127.0.0.1', port_queue.get(timeout=600)
+
+    try:
+        faults = asyncio.run(_fetch_json(host, port, '/faults'))['faults']
+        targets = make_targets(args.requests, [f['catalog_id'] for f in faults], args.seed, args.distinct)
+        cold = asyncio.run(run_load(host, port, targets, args.concurrency))
+        warm = asyncio.run(run_load(host, port, targets, args.concurrency))
+        health = asyncio.run(_fetch_json(host, port, '/health'))
+        print(json.dumps({'cold_cache': cold, 'warm_cache': warm, 'service': health}, indent=2))
+    finally:
+        if process is not None:
+            process.terminate()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,214 @@
+"""
+Time each pipeline stage on synthetic Kandilli catalogs and GEM-style fault sets.
+
+Run from the repository root:
+
+    python -m benchmarks.run_benchmarks --events 1000 100000 --faults 100 5000
+
+Every run is appended to a JSON history file. A stage that is slower than the
+best previous run of the same scale by more than `--tolerance` is reported as a
+regression and the script exits with status 1. Only runs recorded on the same
+host, machine type and Python version are compared.
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import subprocess
+import time
+from datetime import datetime
+
+from benchmarks import synthetic
+
+
+STAGES = ['extract_data', 'filter_features_by_bounds', 'load_and_filter_faults',
+          'match_faults_to_earthquakes', 'calculate_distance_by_m_and_km', 'map_generation']
+
+DEFAULT_WORKDIR = 'benchmarks/.data'
+DEFAULT_HISTORY = 'benchmarks/history.json'
+
+
+def _git_commit():
+    try:
+        out = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, check=True)
+        return out.stdout.strip()
+    except Exception:
+        return None
+
+
+def _timed(func, *args, repeat=1, **kwargs):
+    """Return (result, best wall time in seconds) over `repeat` calls, silencing prints"""
+    best = float('inf')
+    result = None
+    for _ in range(repeat):
+        with contextlib.redirect_stdout(io.StringIO()):
+            start = time.perf_counter()
+            result = func(*args, **kwargs)
+            elapsed = time.perf_counter() - start
+        best = min(best, elapsed)
+    return result, best
+
+
+def prepare_inputs(workdir: str, n_events: int, n_faults: int, n_months: int, seed: int):
+    """Generate (or reuse) the synthetic XML months and fault GeoJSON for one scale"""
+    catalog_dir = os.path.join(workdir, f"catalog_{n_events}_{n_months}_{seed}")
+    fault_path = os.path.join(workdir, f"faults_{n_faults}_{seed}.geojson")
+
+    if os.path.isdir(catalog_dir) and len(os.listdir(catalog_dir)) == n_months:
+        files = sorted(os.path.join(catalog_dir, f) for f in os.listdir(catalog_dir))
+    else:
+        files = synthetic.generate_catalog(catalog_dir, n_events, n_months=n_months, seed=seed)
+    if not os.path.exists(fault_path):
+        synthetic.generate_fault_geojson(fault_path, n_faults, seed=seed)
+    return files, fault_path
+
+
+def run_scale(n_events: int, n_faults: int, args) -> dict:
+    import geojson
+    import modules.data_prep as data_prep
+    import modules.visualisation as viz
+    from modules.model import EarthquakeAnalyzer
+
+    files, fault_path = prepare_inputs(args.workdir, n_events, n_faults, args.months, args.seed)
+    timings = {}
+
+    analyzer = EarthquakeAnalyzer(download_path=os.path.dirname(files[0]))
+    data, timings['extract_data'] = _timed(analyzer.extract_data, files, repeat=args.repeat)
+    data = data_prep.extract_cities(data)
+
+    with open(fault_path, encoding='utf-8') as f:
+        gj = geojson.load(f)
+    limits = data_prep.calculate_fault_coor_limits(data)
+    _, timings['filter_features_by_bounds'] = _timed(
+        data_prep.filter_features_by_bounds, gj['features'], *limits, repeat=args.repeat)
+
+    (features_df, filtered_features, gj), timings['load_and_filter_faults'] = _timed(
+        data_prep.load_and_filter_faults, data, fault_path, repeat=args.repeat)
+
+    if n_events > args.match_max_events:
+        print(f"  skipping match/distance/map: {n_events} events > --match-max-events {args.match_max_events}")
+        return timings
+
+    matched, timings['match_faults_to_earthquakes'] = _timed(
+        lambda: data_prep.match_faults_to_earthquakes(data.copy(), features_df), repeat=args.repeat)
+
+    _, timings['calculate_distance_by_m_and_km'] = _timed(
+        lambda: data_prep.calculate_distance_by_m_and_km(features_df, matched.copy()), repeat=args.repeat)
+
+    map_data = matched.head(args.map_max_events)
+    generators = {
+        'SIMPLE': viz.generate_basic_map,
+        'FAULT_DETAIL': viz.generate_map,
+        'ALTERNATIVE': viz.generate_alt_map,
+    }
+    map_path = os.path.join(args.workdir, 'benchmark_map.html')
+
+    def build_and_save():
+        m = generators[args.map_mode](map_data, filtered_features, gj, 3.5)
+        m.save(map_path)
+
+    _, timings['map_generation'] = _timed(build_and_save, repeat=args.repeat)
+    return timings
+
+
+def load_history(history_path: str) -> list:
+    if not os.path.exists(history_path):
+        return []
+    with open(history_path, encoding='utf-8') as f:
+        return json.load(f)
+
+
+def save_history(history_path: str, history: list):
+    os.makedirs(os.path.dirname(history_path) or '.', exist_ok=True)
+    tmp_path = history_path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(history, f, indent=2)
+    os.replace(tmp_path, history_path)
+
+
+def find_regressions(history: list, record: dict, tolerance: float, min_delta: float = 0.0) -> list:
+    """Compare a run against the best earlier timing of each stage at the same scale, host and Python"""
+    # Timings are only comparable on the same host and interpreter
+    same_scale = [r for r in history
+                  if r['n_events'] == record['n_events'] and r['n_faults'] == record['n_faults']
+                  and r.get('map_mode') == record.get('map_mode')
+                  and r.get('machine') == record.get('machine') and r.get('host') == record.get('host')
+                  and r.get('python') == record.get('python')]
+    regressions = []
+    for stage, seconds in record['timings'].items():
+        previous = [r['timings'][stage] for r in same_scale if stage in r['timings']]
+        if not previous:
+            continue
+        best = min(previous)
+        if best > 0 and seconds > best * tolerance and seconds - best > min_delta:
+            regressions.append({'stage': stage, 'seconds': seconds, 'best': best, 'ratio': seconds / best})
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--events', type=int, nargs='+', default=[1_000, 10_000],
+                        help='catalog sizes to benchmark (1k to 10M)')
+    parser.add_argument('--faults', type=int, nargs='+', default=[100, 1_000],
+                        help='fault set sizes to benchmark (100 to 20k)')
+    parser.add_argument('--months', type=int, default=12, help='number of monthly XML files per catalog')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--repeat', type=int, default=1, help='runs per stage, best time is kept')
+    parser.add_argument('--map-mode', default='SIMPLE', choices=['SIMPLE', 'FAULT_DETAIL', 'ALTERNATIVE'])
+    parser.add_argument('--map-max-events', type=int, default=20_000,
+                        help='events drawn on the benchmark map (folium does not scale past this)')
+    parser.add_argument('--match-max-events', type=int, default=100_000,
+                        help='skip fault matching and later stages above this catalog size '
+                             '(matching applies a per-event loop over every fault)')
+    parser.add_argument('--tolerance', type=float, default=1.25,
+                        help='slowdown ratio against the best previous run that counts as a regression')
+    parser.add_argument('--min-delta', type=float, default=0.01,
+                        help='ignore slowdowns smaller than this many seconds (timer noise on tiny stages)')
+    parser.add_argument('--workdir', default=DEFAULT_WORKDIR)
+    parser.add_argument('--history', default=DEFAULT_HISTORY,
+                        help='JSON file the runs are appended to (git-ignored by default)')
+    parser.add_argument('--no-record', action='store_true', help='do not append this run to the history')
+    args = parser.parse_args(argv)
+
+    history = load_history(args.history)
+    commit = _git_commit()
+    all_regressions = []
+    new_records = []
+
+    for n_events in args.events:
+        for n_faults in args.faults:
+            print(f"Benchmarking {n_events} events x {n_faults} faults")
+            timings = run_scale(n_events, n_faults, args)
+            for stage in STAGES:
+                if stage in timings:
+                    print(f"  {stage:<32} {timings[stage]:10.4f} s")
+
+            record = {
+                'timestamp': datetime.now().isoformat(timespec='seconds'),
+                'commit': commit,
+                'python': platform.python_version(),
+                'machine': platform.machine(),
+                'host': platform.node(),
+                'n_events': n_events,
+                'n_faults': n_faults,
+                'map_mode': args.map_mode,
+                'timings': timings,
+            }
+            regressions = find_regressions(history, record, args.tolerance, args.min_delta)
+            for reg in regressions:
+                print(f"  REGRESSION {reg['stage']}: {reg['seconds']:.4f} s vs best {reg['best']:.4f} s "
+                      f"({reg['ratio']:.2f}x)")
+            all_regressions.extend(regressions)
+            new_records.append(record)
+
+    if not args.no_record:
+        save_history(args.history, history + new_records)
+        print(f"Results appended to {args.history}")
+
+    return 1 if all_regressions else 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
@@ -0,0 +1,114 @@
+"""
+Compare the memory cost of sharing the enriched catalog with worker processes.
+
+The same synthetic catalog is handed to N worker processes either pickled
+(every worker holds its own copy) or as a published snapshot (workers attach
+to the memory-mapped columns). Each worker computes per-fault magnitude
+statistics and reports how much unique memory (USS) it added:
+
+    python -m benchmarks.snapshot_benchmark --events 1000000 --workers 4
+"""
+import argparse
+import multiprocessing as mp
+import os
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+from benchmarks.stats_benchmark import synthetic_enriched
+
+COLUMNS = ['timestamp_dt', 'magnitude', 'latitude', 'longitude', 'depth', 'catalog_id', 'city',
+           'distance_to_fault_km']
+
+
+def _uss_mb() -> float:
+    import psutil
+
+    return psutil.Process().memory_full_info().uss / 2**20
+
+
+def _work(data: pd.DataFrame) -> float:
+    per_fault = data.groupby('catalog_id', observed=True)['magnitude'].agg(['count', 'mean', 'max'])
+    recent = data[data['timestamp_dt'] >= data['timestamp_dt'].max() - pd.Timedelta('30D')]
+    return float(per_fault['mean'].sum() + recent['distance_to_fault_km'].mean())
+
+
+def _uss_mb_task(_):
+    return _uss_mb()
+
+
+def _pickled_worker(args):
+    # The worker's own baseline cannot be taken before its argument is unpickled, so an idle worker's is passed in
+    data, baseline = args
+    _work(data)
+    return _uss_mb() - baseline
+
+
+def _snapshot_worker(args):
+    snapshot, columns = args
+    baseline = _uss_mb()
+    data = snapshot.frame(columns)
+    result = _work(data)
+    return _uss_mb() - baseline, result
+
+
+def _init_worker():
+    import modules.snapshot  # noqa: F401 - import cost is not part of the comparison
+
+
+def enriched_catalog(n_events: int, seed: int = 0) -> pd.DataFrame:
+    data = synthetic_enriched(n_events, seed=seed)
+    rng = np.random.default_rng(seed)
+    data['depth'] = rng.uniform(1.0, 30.0, size=n_events)
+    data['city'] = np.array(['BALIKESIR', 'KAHRAMANMARAS', 'KUTAHYA', 'BINGOL', 'IZMIR', 'MALATYA', None],
+                            dtype=object)[rng.integers(0, 7, size=n_events)]
+    data['distance_to_fault_km'] = rng.exponential(15.0, size=n_events).round(2)
+    return data[COLUMNS]
+
+
+def run(n_events: int, workers: int, root: str, seed: int = 0) -> dict:
+    from modules.snapshot import publish_snapshot
+
+    data = enriched_catalog(n_events, seed)
+    ctx = mp.get_context('spawn')
+
+    start = time.perf_counter()
+    snapshot = publish_snapshot(data, root=root, metadata={'benchmark': True})
+    publish_s = time.perf_counter() - start
+
+    with ctx.Pool(workers, initializer=_init_worker) as pool:
+        start = time.perf_counter()
+        results = pool.map(_snapshot_worker, [(snapshot, COLUMNS)] * workers)
+        snapshot_s = time.perf_counter() - start
+
+    with ctx.Pool(workers, initializer=_init_worker) as pool:
+        baseline = pool.map(_uss_mb_task, range(workers))
+        start = time.perf_counter()
+        pickled = pool.map(_pickled_worker, [(data, float(np.median(baseline)))] * workers)
+        pickled_s = time.perf_counter() - start
+
+    return {'publish_s': publish_s, 'snapshot_s': snapshot_s, 'pickled_s': pickled_s,
+            'snapshot_mb': [r[0] for r in results], 'pickled_mb': pickled,
+            'catalog_mb': data.memory_usage(deep=True).sum() / 2**20}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--events', type=int, default=1_000_000)
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--root', default=os.path.join(tempfile.gettempdir(), 'earthquake_snapshot_bench'))
+    args = parser.parse_args(argv)
+
+    result = run(args.events, args.workers, args.root)
+    print(f"{args.events} events ({result['catalog_mb']:.0f} MB in pandas), {args.workers} workers")
+    print(f"  publish snapshot            {result['publish_s']:8.3f} s")
+    print(f"  snapshot workers            {result['snapshot_s']:8.3f} s, "
+          f"{np.mean(result['snapshot_mb']):7.1f} MB unique memory per worker")
+    print(f"  pickled DataFrame workers   {result['pickled_s']:8.3f} s, "
+          f"{np.mean(result['pickled_mb']):7.1f} MB unique memory per worker")
+
+
+if __name__ == '__main__':
+    main()
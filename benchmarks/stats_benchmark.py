@@ -0,0 +1,78 @@
+"""
+Time incremental refreshes of the rolling-window catalog statistics against a full rebuild.
+
+A synthetic enriched catalog is loaded into `CatalogStatistics` except for
+its last events, which then arrive in small batches as they would from the
+ingestion daemon. After each batch the `all` series and the per-fault window
+statistics are refreshed, and the final result is checked against statistics
+built from scratch:
+
+    python -m benchmarks.stats_benchmark --events 100000 1000000 --batch 200
+"""
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+from benchmarks import synthetic
+
+
+def synthetic_enriched(n_events: int, n_faults: int = 2000, years: int = 10, seed: int = 0) -> pd.DataFrame:
+    """Events with time, magnitude, location and closest-fault columns, sorted by time"""
+    rng = np.random.default_rng(seed)
+    start = pd.Timestamp('2015-01-01').value
+    times = np.sort(rng.integers(start, start + years * 365 * 86400 * 10**9, size=n_events))
+    return pd.DataFrame({
+        'timestamp_dt': pd.to_datetime(times),
+        'magnitude': np.round(np.clip(1.0 + rng.exponential(1 / np.log(10), size=n_events), 0.1, 7.5), 1),
+        'latitude': rng.uniform(*synthetic.REGION_LAT, size=n_events),
+        'longitude': rng.uniform(*synthetic.REGION_LNG, size=n_events),
+        'catalog_id': np.array([f"SYN_{i:06d}" for i in range(n_faults)])[rng.integers(0, n_faults, size=n_events)],
+    })
+
+
+def run_scale(n_events: int, batch: int, n_batches: int, seed: int = 0) -> dict:
+    from modules.catalog_stats import CatalogStatistics, catalog_statistics
+
+    data = synthetic_enriched(n_events, seed=seed)
+    split = n_events - batch * n_batches
+
+    start = time.perf_counter()
+    full = catalog_statistics(data)
+    full.series('all')
+    full.window_stats('catalog_id')
+    rebuild = time.perf_counter() - start
+
+    stats = CatalogStatistics()
+    stats.update(data.iloc[:split])
+    stats.series('all')
+    refreshes = []
+    for i in range(split, n_events, batch):
+        start = time.perf_counter()
+        stats.update(data.iloc[i:i + batch])
+        series = stats.series('all')
+        per_fault = stats.window_stats('catalog_id')
+        refreshes.append(time.perf_counter() - start)
+
+    pd.testing.assert_frame_equal(series, full.series('all'))
+    pd.testing.assert_frame_equal(per_fault, full.window_stats('catalog_id'))
+    return {'rebuild': rebuild, 'refresh_mean': float(np.mean(refreshes)), 'refresh_max': float(np.max(refreshes))}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--events', type=int, nargs='+', default=[100_000, 1_000_000])
+    parser.add_argument('--batch', type=int, default=200, help='events per incremental batch')
+    parser.add_argument('--batches', type=int, default=10)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args(argv)
+
+    for n_events in args.events:
+        result = run_scale(n_events, args.batch, args.batches, args.seed)
+        print(f"{n_events} events: full rebuild {result['rebuild']:.3f} s, incremental refresh of {args.batch} "
+              f"events {result['refresh_mean']:.4f} s (max {result['refresh_max']:.4f} s), results identical")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,203 @@
+import json
+import os
+import numpy as np
+
+
+# Rough bounding box of the Kandilli network (Turkey and surrounding seas)
+REGION_LAT = (35.0, 43.0)
+REGION_LNG = (25.0, 45.0)
+
+LOCATIONS = [
+    ('MARMARA DENIZI', None), ('SINDIRGI', 'BALIKESIR'), ('AKDENIZ', None),
+    ('ELBISTAN', 'KAHRAMANMARAS'), ('SIMAV', 'KUTAHYA'), ('EGE DENIZI', None),
+    ('KARLIOVA', 'BINGOL'), ('SEFERIHISAR', 'IZMIR'), ('DOGANYOL', 'MALATYA'),
+    ('ONIKISUBAT', 'KAHRAMANMARAS'),
+]
+
+SLIP_TYPES = ['Normal', 'Dextral-Normal', 'Sinistral', 'Dextral', 'Subduction_Thrust', 'Sinistral-Normal']
+
+# GEM stores tuple-valued properties as "(most-likely,min,max)" strings
+TUPLE_PROPERTIES = {
+    'average_dip': (20.0, 90.0),
+    'average_rake': (-180.0, 180.0),
+    'lower_seis_depth': (10.0, 25.0),
+    'upper_seis_depth': (0.0, 5.0),
+    'net_slip_rate': (0.1, 20.0),
+}
+
+
+def _month_sequence(start_year: int, start_month: int, n_months: int) -> list:
+    months = []
+    year, month = start_year, start_month
+    for _ in range(n_months):
+        months.append((year, month))
+        month += 1
+        if month > 12:
+            year, month = year + 1, 1
+    return months
+
+
+def _location_strings(rng, n):
+    labels = []
+    for region, city in LOCATIONS:
+        labels.append(f"{region} ({city})" if city else region)
+    return np.array(labels)[rng.integers(0, len(labels), size=n)]
+
+
+def write_kandilli_month(file_path: str, year: int, month: int, n_events: int,
+                         rng: np.random.Generator, chunk_size: int = 200_000) -> str:
+    """Write one month of synthetic events in the Kandilli `earhquake` XML format"""
+    with open(file_path, 'w', encoding='utf-8') as f:
+        f.write('<?xml version="1.0" encoding="UTF-8"?>\n<eqlist>\n')
+        for start in range(0, n_events, chunk_size):
+            n = min(chunk_size, n_events - start)
+            seconds = np.sort(rng.integers(0, 28 * 24 * 3600, size=n))
+            days = seconds // 86400 + 1
+            hours = (seconds % 86400) // 3600
+            minutes = (seconds % 3600) // 60
+            secs = seconds % 60
+            lat = rng.uniform(*REGION_LAT, size=n)
+            lng = rng.uniform(*REGION_LNG, size=n)
+            # Gutenberg-Richter-like magnitudes with b ~ 1
+            mag = np.clip(1.0 + rng.exponential(1 / np.log(10), size=n), 0.1, 7.5)
+            depth = rng.uniform(1.0, 30.0, size=n)
+            locations = _location_strings(rng, n)
+
+            lines = [
+                f'<earhquake name="{year}.{month:02}.{d:02} {h:02}:{mi:02}:{s:02}" '
+                f'lokasyon="{loc}" lat="{la:.4f}" lng="{ln:.4f}" mag="{m:.1f}" Depth="{dp:.1f}"/>\n'
+                for d, h, mi, s, loc, la, ln, m, dp
+                in zip(days, hours, minutes, secs, locations, lat, lng, mag, depth)
+            ]
+            f.writelines(lines)
+        f.write('</eqlist>\n')
+    return file_path
+
+
+def generate_catalog(out_dir: str, n_events: int, start_year: int = 2025, start_month: int = 1,
+                     n_months: int = 12, seed: int = 0) -> list:
+    """Generate `n_events` synthetic events spread over `n_months` monthly XML files"""
+    os.makedirs(out_dir, exist_ok=True)
+    rng = np.random.default_rng(seed)
+    months = _month_sequence(start_year, start_month, n_months)
+    per_month = np.full(len(months), n_events // len(months))
+    per_month[:n_events % len(months)] += 1
+
+    files = []
+    for (year, month), n in zip(months, per_month):
+        file_name = os.path.join(out_dir, f"{year}{month:02}.xml")
+        files.append(write_kandilli_month(file_name, year, month, int(n), rng))
+    return files
+
+
+def _tuple_string(rng, low, high):
+    most_likely = rng.uniform(low, high)
+    spread = (high - low) * 0.1
+    return f"({most_likely:.1f},{max(low, most_likely - spread):.1f},{min(high, most_likely + spread):.1f})"
+
+
+def generate_fault_features(n_faults: int, seed: int = 0, outside_fraction: float = 0.2) -> list:
+    """Build GEM-style LineString fault features; a fraction falls outside the region"""
+    rng = np.random.default_rng(seed)
+    features = []
+    for i in range(n_faults):
+        if rng.random() < outside_fraction:
+            lat0, lng0 = rng.uniform(-60, 60), rng.uniform(-170, 170)
+        else:
+            lat0, lng0 = rng.uniform(*REGION_LAT), rng.uniform(*REGION_LNG)
+
+        n_vertices = int(rng.integers(2, 12))
+        bearing = rng.uniform(0, 2 * np.pi)
+        steps = rng.uniform(0.02, 0.1, size=n_vertices - 1)
+        wiggle = rng.normal(0, 0.3, size=n_vertices - 1)
+        dlat = np.concatenate([[0.0], np.cumsum(steps * np.cos(bearing + wiggle))])
+        dlng = np.concatenate([[0.0], np.cumsum(steps * np.sin(bearing + wiggle))])
+        coords = [[round(lng0 + x, 5), round(lat0 + y, 5)] for x, y in zip(dlng, dlat)]
+
+        props = {
+            'catalog_id': f"SYN_{i:06d}",
+            'catalog_name': 'SYNTHETIC',
+            'name': f"Synthetic fault {i}",
+            'slip_type': SLIP_TYPES[int(rng.integers(0, len(SLIP_TYPES)))],
+            'epistemic_quality': None,
+            'activity_confidence': None,
+            'shortening_rate': None,
+            'strike_slip_rate': None,
+        }
+        for key, (low, high) in TUPLE_PROPERTIES.items():
+            props[key] = _tuple_string(rng, low, high)
+
+        features.append({
+            'type': 'Feature',
+            'geometry': {'type': 'LineString', 'coordinates': coords},
+            'properties': props,
+        })
+    return features
+
+
+def generate_fault_geojson(file_path: str, n_faults: int, seed: int = 0) -> str:
+    """Write a synthetic GEM active-faults FeatureCollection to `file_path`"""
+    os.makedirs(os.path.dirname(file_path) or '.', exist_ok=True)
+    fc = {'type': 'FeatureCollection', 'features': generate_fault_features(n_faults, seed=seed)}
+    with open(file_path, 'w', encoding='utf-8') as f:
+        json.dump(fc, f)
+    return file_path
+
+
+def jittered_copy(events, rng: np.random.Generator, keep_fraction: float = 0.8,
+                  time_jitter_s: float = 3.0, location_jitter_deg: float = 0.05, mag_jitter: float = 0.2):
+    """Re-report a fraction of `events` the way another agency would: perturbed location, time and magnitude"""
+    import pandas as pd
+
+    picked = events.sample(frac=keep_fraction, random_state=int(rng.integers(0, 2**31))).copy()
+    n = len(picked)
+    # Kandilli timestamps are Turkey local time; foreign catalogs publish UTC
+    times = (pd.to_datetime(picked['timestamp'], format='%Y.%m.%d %H:%M:%S')
+             .dt.tz_localize('Europe/Istanbul', ambiguous='NaT', nonexistent='NaT').dt.tz_convert('UTC')
+             .dt.tz_localize(None))
+    picked['time_utc'] = times + pd.to_timedelta(rng.normal(0, time_jitter_s, size=n), unit='s')
+    picked['latitude'] = picked['latitude'] + rng.normal(0, location_jitter_deg, size=n)
+    picked['longitude'] = picked['longitude'] + rng.normal(0, location_jitter_deg, size=n)
+    picked['magnitude'] = (picked['magnitude'] + rng.normal(0, mag_jitter, size=n)).clip(lower=0.1).round(1)
+    return picked
+
+
+def write_usgs_csv(file_path: str, events) -> str:
+    out = events.assign(
+        time=events['time_utc'].dt.strftime('%Y-%m-%dT%H:%M:%S.%f').str[:-3] + 'Z',
+        depth=events['depth'].round(2), mag=events['magnitude'], magType='ml', place=events['location'],
+        id=[f"us{i:08d}" for i in range(len(events))])
+    out[['time', 'latitude', 'longitude', 'depth', 'mag', 'magType', 'place', 'id']].to_csv(file_path, index=False)
+    return file_path
+
+
+def write_emsc_text(file_path: str, events) -> str:
+    with open(file_path, 'w', encoding='utf-8') as f:
+        f.write('#EventID|Time|Latitude|Longitude|Depth/km|Author|Catalog|Contributor|ContributorID|'
+                'MagType|Magnitude|MagAuthor|EventLocationName\n')
+        times = events['time_utc'].dt.strftime('%Y-%m-%dT%H:%M:%S.%f').str[:-3]
+        for i, (t, la, ln, dp, m, loc) in enumerate(zip(times, events['latitude'], events['longitude'],
+                                                       events['depth'], events['magnitude'], events['location'])):
+            f.write(f"{20250000000 + i}|{t}|{la:.4f}|{ln:.4f}|{dp:.1f}|EMSC|EMSC-RTS|EMSC|{i}|ml|{m:.1f}|EMSC|{loc}\n")
+    return file_path
+
+
+def write_quakeml(file_path: str, events) -> str:
+    with open(file_path, 'w', encoding='utf-8') as f:
+        f.write('<?xml version="1.0" encoding="UTF-8"?>\n'
+                '<q:quakeml xmlns="http://quakeml.org/xmlns/bed/1.2" xmlns:q="http://quakeml.org/xmlns/quakeml/1.2">\n'
+                '<eventParameters publicID="smi:synthetic/catalog">\n')
+        times = events['time_utc'].dt.strftime('%Y-%m-%dT%H:%M:%S.%fZ')
+        for i, (t, la, ln, dp, m, loc) in enumerate(zip(times, events['latitude'], events['longitude'],
+                                                       events['depth'], events['magnitude'], events['location'])):
+            f.write(f'<event publicID="smi:synthetic/event/{i}">'
+                    f'<preferredOriginID>smi:synthetic/origin/{i}</preferredOriginID>'
+                    f'<preferredMagnitudeID>smi:synthetic/magnitude/{i}</preferredMagnitudeID>'
+                    f'<description><text>{loc}</text></description>'
+                    f'<origin publicID="smi:synthetic/origin/{i}"><time><value>{t}</value></time>'
+                    f'<latitude><value>{la:.4f}</value></latitude><longitude><value>{ln:.4f}</value></longitude>'
+                    f'<depth><value>{dp * 1000:.0f}</value></depth></origin>'
+                    f'<magnitude publicID="smi:synthetic/magnitude/{i}"><mag><value>{m:.1f}</value></mag>'
+                    f'<type>ML</type></magnitude></event>\n')
+        f.write('</eventParameters>\n</q:quakeml>\n')
+    return file_path
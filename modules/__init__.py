@@ -0,0 +1,21 @@
+"""
+Earthquake data preparation, modelling and map generation.
+
+Submodules are imported on first attribute access so that `import modules`
+stays cheap; the heavy map/notebook stack (folium, branca, ipywidgets) is
+only loaded inside the functions that draw maps.
+"""
+import importlib
+
+_SUBMODULES = {'catalog_stats', 'columnar', 'config', 'data_prep', 'dedup', 'fault_geometry', 'fault_graph', 'ingestion',
+               'model', 'query_service', 'readers', 'snapshot', 'stage_cache', 'visualisation'}
+
+
+def __getattr__(name):
+    if name in _SUBMODULES:
+        return importlib.import_module(f"{__name__}.{name}")
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def __dir__():
+    return sorted(set(globals()) | _SUBMODULES)
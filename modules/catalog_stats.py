@@ -0,0 +1,275 @@
+"""
+Magnitude of completeness, b-value and event-rate statistics on rolling time windows.
+
+Events are counted into 0.1-magnitude histograms, one per time bucket
+(`STATS_BUCKET`) and per key of each grouping: the whole catalog (`all`),
+lat/lng grid cells (`region`) and closest faults (`catalog_id`). Adding new
+events only increments the histograms they fall into and marks the windows
+covering those buckets as stale, so a refresh costs O(new events) plus the
+affected windows, never a pass over the full catalog.
+
+Every window statistic is derived from the summed histogram of the window:
+
+- `mc`: maximum curvature (the most populated bin) plus `STATS_MC_CORRECTION`
+- `b_value`: Aki-Utsu maximum likelihood estimate above `mc`, with the
+  half-bin correction, and its Shi & Bolt (1982) standard error `b_std`
+- `a_value`: log10 of the number of events above `mc` plus `b_value * mc`
+- `rate_per_day`, `rate_above_mc_per_day`: event counts divided by the window length
+"""
+import numpy as np
+import pandas as pd
+from modules.config import STATS_BUCKET, STATS_WINDOW, STATS_REGION_CELL_DEG, STATS_MIN_EVENTS, STATS_MC_CORRECTION
+
+
+BIN_WIDTH = 0.1
+N_BINS = 100 # magnitudes 0.0 - 9.9
+BIN_MAGNITUDES = np.arange(N_BINS) * BIN_WIDTH
+GROUPS = ('all', 'region', 'catalog_id')
+STAT_COLUMNS = ['n_events', 'n_above_mc', 'mc', 'b_value', 'b_std', 'a_value', 'rate_per_day',
+                'rate_above_mc_per_day']
+
+
+def magnitude_bins(magnitudes) -> np.ndarray:
+    """0.1-wide histogram bin of each magnitude (values outside 0.0 - 9.9 go to the end bins)"""
+    return np.clip(np.floor(np.asarray(magnitudes, dtype=float) / BIN_WIDTH + 0.5), 0, N_BINS - 1).astype(np.int64)
+
+
+def histogram_statistics(hist: np.ndarray, window_days: float, min_events: int = STATS_MIN_EVENTS,
+                         mc_correction: float = STATS_MC_CORRECTION) -> dict:
+    """Window statistics for each row of a (windows x N_BINS) histogram matrix"""
+    hist = np.atleast_2d(hist).astype(float)
+    n_events = hist.sum(axis=1)
+    mc_bin = np.argmax(hist, axis=1) + int(round(mc_correction / BIN_WIDTH))
+    above = hist * (np.arange(N_BINS)[None, :] >= mc_bin[:, None])
+    n_above = above.sum(axis=1)
+    mc = mc_bin * BIN_WIDTH
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        mean = (above * BIN_MAGNITUDES).sum(axis=1) / n_above
+        b_value = np.log10(np.e) / (mean - (mc - BIN_WIDTH / 2))
+        variance = (above * (BIN_MAGNITUDES[None, :] - mean[:, None]) ** 2).sum(axis=1) / (n_above * (n_above - 1))
+        b_std = 2.3 * b_value ** 2 * np.sqrt(variance)
+        a_value = np.log10(n_above) + b_value * mc
+
+    enough = n_above >= max(min_events, 2)
+    empty = n_events == 0
+    return {
+        'n_events': n_events.astype(np.int64),
+        'n_above_mc': np.where(empty, 0, n_above).astype(np.int64),
+        'mc': np.where(empty, np.nan, mc),
+        'b_value': np.where(enough, b_value, np.nan),
+        'b_std': np.where(enough, b_std, np.nan),
+        'a_value': np.where(enough, a_value, np.nan),
+        'rate_per_day': n_events / window_days,
+        'rate_above_mc_per_day': np.where(empty, 0, n_above) / window_days,
+    }
+
+
+class _KeyHistograms:
+    """
+    Sparse magnitude histograms of one key: (bucket, bin, count) triples sorted by bucket.
+
+    Triples live in over-allocated arrays so appending a batch of new buckets
+    costs O(batch); only out-of-order (late) buckets trigger a re-sort.
+    """
+
+    def __init__(self):
+        self.buckets = np.empty(0, dtype=np.int64)
+        self.bins = np.empty(0, dtype=np.int64)
+        self.counts = np.empty(0, dtype=np.int64)
+        self.size = 0
+        self.first = None
+        self.series_start = None
+        self.series = None
+        self.stale_from = None
+        self.version = 0
+        self._window_cache = (None, None)
+
+    def add(self, buckets: np.ndarray, bins: np.ndarray, counts: np.ndarray):
+        """Append triples sorted by bucket"""
+        n = len(buckets)
+        if self.size + n > len(self.buckets):
+            capacity = max(2 * len(self.buckets), self.size + n, 64)
+            for name in ('buckets', 'bins', 'counts'):
+                grown = np.empty(capacity, dtype=np.int64)
+                grown[:self.size] = getattr(self, name)[:self.size]
+                setattr(self, name, grown)
+        in_order = self.size == 0 or buckets[0] >= self.buckets[self.size - 1]
+        end = self.size + n
+        self.buckets[self.size:end], self.bins[self.size:end], self.counts[self.size:end] = buckets, bins, counts
+        self.size = end
+        if not in_order:
+            order = np.argsort(self.buckets[:end], kind='stable')
+            for name in ('buckets', 'bins', 'counts'):
+                getattr(self, name)[:end] = getattr(self, name)[:end][order]
+
+        self.first = int(buckets[0]) if self.first is None else min(self.first, int(buckets[0]))
+        self.stale_from = int(buckets[0]) if self.stale_from is None else min(self.stale_from, int(buckets[0]))
+        self.version += 1
+
+    def _slice(self, lo: int, hi: int) -> slice:
+        used = self.buckets[:self.size]
+        return slice(np.searchsorted(used, lo, side='left'), np.searchsorted(used, hi, side='right'))
+
+    def histogram(self, lo: int, hi: int) -> np.ndarray:
+        """Magnitude histogram of buckets lo..hi"""
+        s = self._slice(lo, hi)
+        return np.bincount(self.bins[s], weights=self.counts[s], minlength=N_BINS).astype(np.int64)
+
+    def cached_histogram(self, lo: int, hi: int) -> np.ndarray:
+        """`histogram(lo, hi)`, reused until the range or the key's events change"""
+        key, hist = self._window_cache
+        if key != (lo, hi, self.version):
+            hist = self.histogram(lo, hi)
+            self._window_cache = ((lo, hi, self.version), hist)
+        return hist
+
+    def window_histograms(self, ends: np.ndarray, window: int) -> np.ndarray:
+        """Summed histogram of the `window` buckets ending at each of `ends` (sorted)"""
+        s = self._slice(ends[0] - window + 1, ends[-1])
+        occupied, rows = np.unique(self.buckets[s], return_inverse=True)
+        dense = np.zeros((len(occupied), N_BINS), dtype=np.int64)
+        np.add.at(dense, (rows, self.bins[s]), self.counts[s])
+        prefix = np.zeros((len(occupied) + 1, N_BINS), dtype=np.int64)
+        np.cumsum(dense, axis=0, out=prefix[1:])
+        right = np.searchsorted(occupied, ends, side='right')
+        left = np.searchsorted(occupied, ends - window, side='right')
+        return prefix[right] - prefix[left]
+
+
+class CatalogStatistics:
+    """
+    Rolling-window Mc, b-value and rate statistics, updated incrementally.
+
+    Feed events with `update` (the full catalog once, then each new batch,
+    e.g. as the `on_batch` callback of `IngestionDaemon`); events must not be
+    passed twice. `series(group, key)` returns the statistics of every window
+    ending at each bucket, `window_stats(group)` those of one window for every key.
+    """
+
+    def __init__(self, bucket: str = STATS_BUCKET, window: str = STATS_WINDOW,
+                 cell_deg: float = STATS_REGION_CELL_DEG, min_events: int = STATS_MIN_EVENTS,
+                 mc_correction: float = STATS_MC_CORRECTION):
+        self.bucket = pd.Timedelta(bucket)
+        self.window = int(pd.Timedelta(window) / self.bucket)
+        if self.window < 1:
+            raise ValueError("STATS_WINDOW must be at least one STATS_BUCKET long")
+        self.window_days = self.window * self.bucket / pd.Timedelta('1D')
+        self.cell_deg = cell_deg
+        self.min_events = min_events
+        self.mc_correction = mc_correction
+        self.keys = {group: {} for group in GROUPS}
+        self.latest = None
+        self.n_events = 0
+
+    def _bucket_start(self, bucket: int) -> pd.Timestamp:
+        return pd.Timestamp(0) + bucket * self.bucket
+
+    def region_key(self, lat: float, lng: float) -> str:
+        """Key of the `region` grid cell containing lat/lng: its south-west corner as 'lat,lng'"""
+        return f"{np.floor(lat / self.cell_deg) * self.cell_deg:.2f},{np.floor(lng / self.cell_deg) * self.cell_deg:.2f}"
+
+    def _group_codes(self, group: str, data: pd.DataFrame, valid: np.ndarray) -> tuple:
+        """Integer code of every valid event within `group` (-1: no key) and the key of each code"""
+        if group == 'all':
+            return np.zeros(int(valid.sum()), dtype=np.int64), ['all']
+        if group == 'region':
+            lat_cell = np.floor(data['latitude'].to_numpy(dtype=float)[valid] / self.cell_deg).astype(np.int64)
+            lng_cell = np.floor(data['longitude'].to_numpy(dtype=float)[valid] / self.cell_deg).astype(np.int64)
+            cells, codes = np.unique(lat_cell * 2**32 + lng_cell, return_inverse=True)
+            names = [self.region_key(((c + 2**31) >> 32) * self.cell_deg, (((c + 2**31) & 0xFFFFFFFF) - 2**31)
+                                     * self.cell_deg) for c in cells]
+            return codes, names
+        if group not in data.columns:
+            return None, []
+        codes, names = pd.factorize(data[group].to_numpy()[valid])
+        return codes, list(names)
+
+    def update(self, data: pd.DataFrame) -> int:
+        """Add new events to the histograms; returns the number of events counted"""
+        times = data['timestamp_dt'] if 'timestamp_dt' in data.columns else pd.to_datetime(data['timestamp'],
+                                                                                            errors='coerce')
+        mags = pd.to_numeric(data['magnitude'], errors='coerce')
+        valid = (times.notna() & mags.notna()).to_numpy()
+        if not valid.any():
+            return 0
+
+        ns = times.to_numpy(dtype='datetime64[ns]').astype(np.int64)[valid]
+        buckets = ns // self.bucket.value
+        first_bucket = int(buckets.min())
+        bins = magnitude_bins(mags.to_numpy()[valid])
+
+        for group in GROUPS:
+            codes, names = self._group_codes(group, data, valid)
+            if codes is None:
+                continue
+            keep = codes >= 0
+            # Count events per (key, bucket, bin) in one pass over a packed int64 key
+            packed = (codes[keep] << 40) | ((buckets[keep] - first_bucket) << 8) | bins[keep]
+            packed, counts = np.unique(packed, return_counts=True)
+            key_codes = packed >> 40
+            starts = np.flatnonzero(np.r_[True, key_codes[1:] != key_codes[:-1]])
+            ends = np.r_[starts[1:], len(packed)]
+            table = self.keys[group]
+            for s, e in zip(starts, ends):
+                name = names[key_codes[s]]
+                if name not in table:
+                    table[name] = _KeyHistograms()
+                table[name].add(((packed[s:e] >> 8) & 0xFFFFFFFF) + first_bucket, packed[s:e] & 0xFF, counts[s:e])
+
+        newest = int(buckets.max())
+        self.latest = newest if self.latest is None else max(self.latest, newest)
+        self.n_events += int(valid.sum())
+        return int(valid.sum())
+
+    def _statistics(self, hist: np.ndarray) -> dict:
+        return histogram_statistics(hist, self.window_days, self.min_events, self.mc_correction)
+
+    def series(self, group: str, key='all') -> pd.DataFrame:
+        """Statistics of the window ending at every bucket from the key's first event to the latest bucket"""
+        entry = self.keys[group].get(key)
+        if entry is None:
+            return pd.DataFrame(columns=['window_end'] + STAT_COLUMNS)
+
+        last = self.latest
+        if entry.series is None or (entry.stale_from is not None and entry.stale_from < entry.series_start):
+            start, cached = entry.first, {}
+        else:
+            start, cached = entry.series_start, entry.series
+        cached_len = len(next(iter(cached.values()))) if cached else 0
+        # Windows ending before the first stale bucket are still valid, as are those already computed past it
+        recompute_from = start + cached_len
+        if entry.stale_from is not None:
+            recompute_from = min(recompute_from, entry.stale_from)
+        if recompute_from <= last:
+            ends = np.arange(recompute_from, last + 1, dtype=np.int64)
+            fresh = self._statistics(entry.window_histograms(ends, self.window))
+            keep = recompute_from - start
+            cached = {c: np.concatenate([cached[c][:keep], fresh[c]]) if cached else fresh[c] for c in STAT_COLUMNS}
+        entry.series_start, entry.series, entry.stale_from = start, cached, None
+
+        frame = pd.DataFrame(cached)
+        frame.insert(0, 'window_end', pd.to_datetime((np.arange(start, last + 1) + 1) * self.bucket.value))
+        return frame
+
+    def window_stats(self, group: str, end=None) -> pd.DataFrame:
+        """Statistics of the window ending at `end` (default: the latest bucket) for every key of `group`"""
+        if self.latest is None:
+            return pd.DataFrame(columns=[group] + STAT_COLUMNS)
+        last = self.latest if end is None else int(pd.Timestamp(end).value // self.bucket.value)
+        table = self.keys[group]
+        names = list(table)
+        hist = np.zeros((len(names), N_BINS), dtype=np.int64)
+        for row, name in enumerate(names):
+            hist[row] = table[name].cached_histogram(last - self.window + 1, last)
+        frame = pd.DataFrame(self._statistics(hist))
+        frame.insert(0, group, names)
+        frame['window_end'] = self._bucket_start(last + 1)
+        return frame.sort_values('n_events', ascending=False, kind='stable').reset_index(drop=True)
+
+
+def catalog_statistics(data: pd.DataFrame, **kwargs) -> CatalogStatistics:
+    """Build a `CatalogStatistics` from a whole enriched catalog"""
+    stats = CatalogStatistics(**kwargs)
+    stats.update(data)
+    return stats
@@ -0,0 +1,220 @@
+"""
+Minimal on-disk columnar dataset: one `.npy` file per column per part plus a JSON manifest.
+
+Numeric and datetime columns are stored as plain arrays, text as a UTF-8 byte
+buffer with int64 offsets, nested values (e.g. fault coordinate lists) as
+JSON text and pandas categoricals as their integer codes plus the encoded
+categories. Every array can be opened with `np.load(..., mmap_mode='r')`, so
+readers only page in the columns and parts they touch, and memory-mapped
+numeric, datetime and categorical columns are used without copying.
+"""
+import json
+import os
+import shutil
+import numpy as np
+import pandas as pd
+
+
+MANIFEST = 'manifest.json'
+
+
+def _column_kind(series: pd.Series) -> str:
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        return 'category'
+    if pd.api.types.is_bool_dtype(series):
+        return 'bool'
+    if pd.api.types.is_datetime64_any_dtype(series):
+        return 'datetime'
+    if pd.api.types.is_numeric_dtype(series):
+        return 'number'
+    for value in series:
+        if isinstance(value, (list, tuple, dict)):
+            return 'json'
+    return 'str'
+
+
+def _encode_text(values) -> tuple:
+    encoded = [v.encode('utf-8') for v in values]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    np.cumsum([len(b) for b in encoded], out=offsets[1:])
+    data = np.frombuffer(b''.join(encoded), dtype=np.uint8)
+    return data, offsets
+
+
+def _decode_text(data, offsets, mask) -> np.ndarray:
+    raw = bytes(data)
+    out = np.empty(len(offsets) - 1, dtype=object)
+    for i in range(len(out)):
+        out[i] = None if mask[i] else raw[offsets[i]:offsets[i + 1]].decode('utf-8')
+    return out
+
+
+def write_columns(directory: str, df: pd.DataFrame) -> dict:
+    """Write every column of `df` under `directory`; return the {column: kind} schema"""
+    os.makedirs(directory, exist_ok=True)
+    schema = {}
+    for i, column in enumerate(df.columns):
+        series = df[column]
+        kind = _column_kind(series)
+        stem = os.path.join(directory, f"c{i:03d}")
+        if kind == 'datetime':
+            # Stored in the column's own unit (pandas 3 defaults to us), so reading it back gives the same dtype
+            values = series.dt.tz_convert(None) if series.dt.tz is not None else series
+            values = values.to_numpy()
+            unit = np.datetime_data(values.dtype)[0]
+            np.save(stem + '.npy', values.view(np.int64))
+        elif kind in ('number', 'bool'):
+            if isinstance(series.dtype, pd.api.extensions.ExtensionDtype) and series.hasnans:
+                # Nullable columns (e.g. Int64 with missing values) are stored as float with NaN
+                np.save(stem + '.npy', series.to_numpy(dtype='float64', na_value=np.nan))
+            else:
+                np.save(stem + '.npy', series.to_numpy())
+        elif kind == 'category':
+            np.save(stem + '.codes.npy', series.cat.codes.to_numpy())
+            data, offsets = _encode_text([json.dumps(c) for c in series.cat.categories])
+            np.save(stem + '.cats.data.npy', data)
+            np.save(stem + '.cats.offsets.npy', offsets)
+        else:
+            mask = series.isna().to_numpy() if kind == 'str' else np.array(
+                [v is None or (isinstance(v, float) and np.isnan(v)) for v in series], dtype=bool)
+            if kind == 'json':
+                texts = ['' if m else json.dumps(v) for v, m in zip(series, mask)]
+            else:
+                texts = ['' if m else str(v) for v, m in zip(series, mask)]
+            data, offsets = _encode_text(texts)
+            np.save(stem + '.data.npy', data)
+            np.save(stem + '.offsets.npy', offsets)
+            np.save(stem + '.mask.npy', mask)
+        schema[column] = {'kind': kind, 'file': f"c{i:03d}"}
+        if kind == 'datetime':
+            schema[column]['unit'] = unit
+    return schema
+
+
+def open_column(directory: str, spec: dict, mmap: bool = True) -> dict:
+    """
+    Open the arrays of one column written by `write_columns` without decoding them.
+
+    Memory maps stay readable after their files are deleted (on POSIX
+    systems), so columns opened here can still be decoded later.
+    """
+    mode = 'r' if mmap else None
+    stem = os.path.join(directory, spec['file'])
+    if spec['kind'] in ('number', 'bool', 'datetime'):
+        return {'values': np.load(stem + '.npy', mmap_mode=mode)}
+    if spec['kind'] == 'category':
+        return {'codes': np.load(stem + '.codes.npy', mmap_mode=mode),
+                'data': np.load(stem + '.cats.data.npy'), 'offsets': np.load(stem + '.cats.offsets.npy')}
+    return {'data': np.load(stem + '.data.npy', mmap_mode=mode),
+            'offsets': np.load(stem + '.offsets.npy', mmap_mode=mode),
+            'mask': np.load(stem + '.mask.npy', mmap_mode=mode)}
+
+
+def decode_column(spec: dict, arrays: dict):
+    """Column values from the arrays returned by `open_column` (numeric columns are not copied)"""
+    if spec['kind'] in ('number', 'bool'):
+        return arrays['values']
+    if spec['kind'] == 'datetime':
+        return arrays['values'].view(f"datetime64[{spec.get('unit', 'ns')}]")
+    if spec['kind'] == 'category':
+        data, offsets = arrays['data'], arrays['offsets']
+        categories = [json.loads(c) for c in _decode_text(data, offsets, np.zeros(len(offsets) - 1, dtype=bool))]
+        # Codes are stored in the dtype pandas picks for this many categories, so they are not copied
+        return pd.Categorical.from_codes(arrays['codes'], categories=categories, validate=False)
+    values = _decode_text(arrays['data'], arrays['offsets'], arrays['mask'])
+    if spec['kind'] == 'json':
+        for i, v in enumerate(values):
+            if v is not None:
+                values[i] = json.loads(v)
+    return values
+
+
+def load_column(directory: str, spec: dict, mmap: bool = True):
+    """Load one column written by `write_columns` (numeric columns stay memory-mapped)"""
+    return decode_column(spec, open_column(directory, spec, mmap))
+
+
+def read_columns(directory: str, schema: dict, columns=None, mmap: bool = True) -> pd.DataFrame:
+    columns = list(schema) if columns is None else [c for c in columns if c in schema]
+    return pd.DataFrame({c: pd.Series(load_column(directory, schema[c], mmap), copy=False) for c in columns},
+                        copy=False)
+
+
+def _write_json_atomic(path: str, payload):
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(payload, f, indent=1)
+    os.replace(tmp_path, path)
+
+
+class ColumnarDataset:
+    """
+    Append-only dataset of DataFrame parts.
+
+    The manifest is rewritten atomically after each appended part, so an
+    interrupted run leaves a readable dataset and can be resumed by skipping
+    the sources it already lists.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        os.makedirs(path, exist_ok=True)
+        manifest_path = os.path.join(path, MANIFEST)
+        if os.path.exists(manifest_path):
+            with open(manifest_path, encoding='utf-8') as f:
+                self.manifest = json.load(f)
+        else:
+            self.manifest = {'next_part': 0, 'parts': []}
+
+    @property
+    def parts(self) -> list:
+        return self.manifest['parts']
+
+    @property
+    def num_rows(self) -> int:
+        return sum(p['rows'] for p in self.parts)
+
+    def _save_manifest(self):
+        _write_json_atomic(os.path.join(self.path, MANIFEST), self.manifest)
+
+    def append(self, df: pd.DataFrame, source: dict = None) -> dict:
+        name = f"part-{self.manifest['next_part']:05d}"
+        self.manifest['next_part'] += 1
+        schema = write_columns(os.path.join(self.path, name), df)
+        part = {'name': name, 'rows': int(len(df)), 'schema': schema, 'source': source}
+        self.parts.append(part)
+        self._save_manifest()
+        return part
+
+    def is_complete(self, key: str, fingerprint) -> bool:
+        return self.manifest.get('completed', {}).get(key) == fingerprint
+
+    def mark_complete(self, key: str, fingerprint):
+        """Record that every part for source `key` has been written"""
+        self.manifest.setdefault('completed', {})[key] = fingerprint
+        self._save_manifest()
+
+    def drop_source(self, key: str):
+        """Remove all parts written for source `key` (e.g. a partial or outdated month)"""
+        self.manifest.get('completed', {}).pop(key, None)
+        self.drop_parts(lambda part: (part.get('source') or {}).get('key') == key)
+
+    def drop_parts(self, predicate):
+        """Remove every part for which `predicate(part)` is true"""
+        dropped = [part for part in self.parts if predicate(part)]
+        self.manifest['parts'] = [part for part in self.parts if not predicate(part)]
+        # The manifest stops referencing the parts before they are deleted, so a crash in between
+        # leaves unreferenced directories rather than a manifest pointing at missing files
+        self._save_manifest()
+        for part in dropped:
+            shutil.rmtree(os.path.join(self.path, part['name']), ignore_errors=True)
+
+    def iter_parts(self, columns=None, mmap: bool = True):
+        for part in self.parts:
+            yield read_columns(os.path.join(self.path, part['name']), part['schema'], columns, mmap)
+
+    def read(self, columns=None) -> pd.DataFrame:
+        frames = list(self.iter_parts(columns, mmap=False))
+        if not frames:
+            return pd.DataFrame()
+        return pd.concat(frames, ignore_index=True)
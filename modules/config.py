@@ -11,3 +11,67 @@ GEOJSON_OF_FAULTS_PATH = 'faults/gem_active_faults.geojson'
 TUPLE_COLUMNS_TO_UNPACK = ['average_dip', 'average_rake', 'lower_seis_depth', 'net_slip_rate', 'upper_seis_depth']
 HIGH_MAG_THRESHOLD = 3.5
 MAP_MODE = 'SIMPLE' #options: 'SIMPLE', 'FAULT_DETAIL', 'ALTERNATIVE'
+DISTANCE_MODE = '2D' #options: '2D', '3D' ('3D' adds hypocenter to fault-plane distances using dip and seismogenic depths)
+
+#min_lat, max_lat, min_lng, max_lng used to pre-filter faults when the data extent is not known up front
+REGION_BOUNDS = (34, 44, 24, 46)
+
+KANDILLI_URL_TEMPLATE = 'http://udim.koeri.boun.edu.tr/zeqmap/xmlt/{year}{month:02}.xml'
+KANDILLI_TIMEZONE = 'Europe/Istanbul' #Kandilli timestamps are Turkey local time (UTC+2/+3 before late 2016, UTC+3 since)
+
+# Near-real-time ingestion of the current month feed
+INGEST_POLL_INTERVAL_SECONDS = 60
+INGEST_STATE_PATH = './earthquake_data/ingest_state'
+INGEST_KEEP_BATCHES = 100 #recent enriched batches kept in memory for `IngestionDaemon.catalog`, 0 keeps none
+INGEST_METRIC_SAMPLES = 10000 #latest latency samples kept for the percentiles in `IngestionMetrics.summary`
+
+# Local query service over the enriched catalog
+QUERY_HOST = '127.0.0.1'
+QUERY_PORT = 8765
+QUERY_CACHE_SIZE = 4096 #cached responses
+QUERY_GRID_CELL_DEG = 0.5 #spatial index cell size in degrees
+QUERY_MAX_RESULTS = 1000
+
+# Chunked (out-of-core) processing of long date ranges
+CHUNKED_OUTPUT_PATH = './earthquake_data/enriched'
+CHUNK_SIZE_EVENTS = None #None processes month by month, an int splits months into N-event chunks
+MEMORY_LIMIT_MB = 1024
+
+# Other catalogs (USGS/EMSC CSV or FDSN text, QuakeML) merged into the Kandilli data
+EXTRA_CATALOG_PATHS = []
+DEDUP_TIME_TOLERANCE_S = 16
+DEDUP_DISTANCE_TOLERANCE_KM = 30
+DEDUP_MAGNITUDE_TOLERANCE = 1.0
+DEDUP_SOURCE_PRIORITY = ['kandilli', 'emsc', 'usgs', 'quakeml'] #which source's row is kept for a matched event
+
+# 3D hypocenter-to-fault-plane distances, used when a fault lacks the GEM value
+FAULT_DEFAULT_DIP = 90.0
+FAULT_DEFAULT_UPPER_DEPTH_KM = 0.0
+FAULT_DEFAULT_LOWER_DEPTH_KM = 20.0
+FAULT_3D_CHUNK_EVENTS = 20_000 #events evaluated per vectorized batch
+FAULT_3D_NEAREST_SEGMENTS = 8 #nearest fault segments used to bound the search
+
+# Catalog statistics (Mc, b-value, event rates) on rolling windows
+STATS_BUCKET = '1D' #time resolution of the magnitude histograms
+STATS_WINDOW = '365D' #rolling window length, a multiple of STATS_BUCKET
+STATS_REGION_CELL_DEG = 1.0
+STATS_MIN_EVENTS = 50 #windows with fewer events above Mc get no b-value
+STATS_MC_CORRECTION = 0.2 #added to the maximum-curvature Mc
+
+# Fault neighbour graph
+FAULT_GRAPH_THRESHOLD_KM = 5.0 #faults whose traces come closer than this are neighbours
+FAULT_GRAPH_MAX_PIECE_KM = 5.0 #long trace segments are cut into pieces of at most this length for the spatial index
+FAULT_GRAPH_HOPS = 2
+FAULT_GRAPH_HOP_DECAY = 0.5 #weight multiplier per hop when propagating activity
+FAULT_GRAPH_DISTANCE_SCALE_KM = 5.0 #edge weight is exp(-distance / scale)
+
+# Shared catalog snapshots
+SNAPSHOT_PATH = './earthquake_data/snapshots'
+SNAPSHOT_KEEP = 3 #older snapshots are deleted after each publish
+SNAPSHOT_CATEGORY_MAX_RATIO = 0.5 #text columns with fewer distinct values than this share of rows are stored as categoricals
+
+# Stage cache for data_prep_pipeline
+STAGE_CACHE_PATH = './earthquake_data/stage_cache'
+STAGE_CACHE_ENABLED = True
+STAGE_CACHE_KEEP_PER_STAGE = 3 #cached outputs kept per stage, least recently used are removed
+STAGE_CACHE_REFRESH_SECONDS = 3600 #how often a range that includes the current month is re-downloaded
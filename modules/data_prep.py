@@ -1,14 +1,25 @@
 
 import pandas as pd
 import re
+import os
+import gc
 from math import radians, sin, cos, asin, sqrt, floor, ceil  
-from scipy.spatial.distance import cdist
 import numpy as np 
-import geojson
+from collections.abc import Mapping
 from datetime import datetime, timedelta
-from modules.analysis_class import EarthquakeAnalyzer
+from xml.etree import ElementTree as ET
+from modules.model import EarthquakeAnalyzer
 import modules.data_prep as data_prep
+from modules.columnar import ColumnarDataset
+import modules.readers as readers
+import modules.dedup as dedup
+import modules.fault_geometry as fault_geometry
+from modules.stage_cache import StageCache, file_fingerprint, fingerprint
 from modules.config import GEOJSON_OF_FAULTS_PATH, DATE_INTERVAL, START_MONTH, START_YEAR, END_MONTH, END_YEAR, TUPLE_COLUMNS_TO_UNPACK
+from modules.config import REGION_BOUNDS, CHUNKED_OUTPUT_PATH, CHUNK_SIZE_EVENTS, MEMORY_LIMIT_MB, EXTRA_CATALOG_PATHS, DISTANCE_MODE
+from modules.config import (KANDILLI_TIMEZONE, DEDUP_TIME_TOLERANCE_S, DEDUP_DISTANCE_TOLERANCE_KM,
+                            DEDUP_MAGNITUDE_TOLERANCE, DEDUP_SOURCE_PRIORITY, FAULT_DEFAULT_DIP,
+                            FAULT_DEFAULT_UPPER_DEPTH_KM, FAULT_DEFAULT_LOWER_DEPTH_KM, STAGE_CACHE_REFRESH_SECONDS)
 
 
 
@@ -68,9 +79,11 @@ def filter_features_by_bounds(features, min_lat, max_lat, min_lng, max_lng):
     
     return filtered
 
-def load_and_filter_faults(data: pd.DataFrame) -> pd.DataFrame:
+def load_and_filter_faults(data: pd.DataFrame, geojson_path: str = GEOJSON_OF_FAULTS_PATH) -> pd.DataFrame:
 
-    with open(GEOJSON_OF_FAULTS_PATH, encoding='utf-8') as f:
+    import geojson
+
+    with open(geojson_path, encoding='utf-8') as f:
         gj = geojson.load(f)
 
     min_lat, max_lat, min_lng, max_lng = calculate_fault_coor_limits(data)
@@ -82,7 +95,20 @@ def load_and_filter_faults(data: pd.DataFrame) -> pd.DataFrame:
     print(f"Total features: {len(gj['features'])}")
     print(f"Filtered features: {len(filtered_features)}")
 
+    features_df = features_to_dataframe(filtered_features)
+    
+    return features_df, filtered_features, gj
+
 
+def load_faults_in_bounds(bounds: tuple, geojson_path: str = GEOJSON_OF_FAULTS_PATH) -> tuple:
+    """Load faults for a fixed (min_lat, max_lat, min_lng, max_lng) region instead of the data extent"""
+    min_lat, max_lat, min_lng, max_lng = bounds
+    corners = pd.DataFrame({'latitude': [min_lat, max_lat], 'longitude': [min_lng, max_lng]})
+    return load_and_filter_faults(corners, geojson_path)
+
+
+def features_to_dataframe(filtered_features: list) -> pd.DataFrame:
+    """One row per fault feature: its properties plus geometry type and coordinates"""
     features_list = []
     for feature in filtered_features:
         row = feature.get('properties', {}).copy()
@@ -100,13 +126,13 @@ def load_and_filter_faults(data: pd.DataFrame) -> pd.DataFrame:
         
         features_list.append(row)
 
-    features_df = pd.DataFrame(features_list)
-    
-    return features_df, filtered_features, gj
+    return pd.DataFrame(features_list)
 
 
 def find_closest_fault(earthquake_lat, earthquake_lng, faults_df):
     """Find closest fault line to an earthquake"""
+    from scipy.spatial.distance import cdist
+
     try:
 
         fault_coords = []
@@ -276,22 +302,252 @@ def re_filter_data_by_date_interval(data: pd.DataFrame, DATE_INTERVAL=DATE_INTER
     
 
 
-def data_prep_pipeline():
-    analyzer = EarthquakeAnalyzer(download_path="./earthquake_data")
-    files = analyzer.query_period(start_year=START_YEAR, start_month=START_MONTH, end_year=END_YEAR, end_month=END_MONTH)
-    data = analyzer.extract_data(files)
+def enrich_data(data: pd.DataFrame, features_df: pd.DataFrame, distance_mode: str = DISTANCE_MODE) -> pd.DataFrame:
+    """Attach closest fault, distances and unpacked fault properties to parsed events"""
     data = data_prep.extract_cities(data)
-    features_df, filtered_features, gj = data_prep.load_and_filter_faults(data)
     data = data_prep.match_faults_to_earthquakes(data, features_df)
     data['timestamp_dt'] = pd.to_datetime(data['timestamp'], errors='coerce')
     data = data_prep.calculate_distance_by_m_and_km(features_df, data)
+    if distance_mode == '3D':
+        data = fault_geometry.calculate_3d_distance_to_fault(features_df, data)
     for col in TUPLE_COLUMNS_TO_UNPACK:
         data = data_prep.unpack_tuple_for_most_likely_value(data, col)
 
     data = data.rename(columns={'coordinates': 'fault_coordinates'})
     data = data.drop(columns=['geometry_type', 'catalog_name', 'epistemic_quality',
                               'activity_confidence', 'shortening_rate',
-                              'strike_slip_rate'])
+                              'strike_slip_rate'], errors='ignore')
+    return data
+
+
+def merge_extra_catalogs(data: pd.DataFrame, paths: list = EXTRA_CATALOG_PATHS) -> pd.DataFrame:
+    """Add events from other catalogs (USGS/EMSC/QuakeML) and drop the ones Kandilli already has"""
+    if not paths:
+        return data
+    extra = readers.read_catalogs(paths)
+    if extra.empty:
+        return data
+    # The readers set `timestamp_dt`; without it here every Kandilli row would be NaT after the concat
+    data = data.assign(source=readers.KandilliXMLReader.source,
+                       timestamp_dt=pd.to_datetime(data['timestamp'], format=readers.TIMESTAMP_FORMAT, errors='coerce'))
+    return dedup.deduplicate_events(pd.concat([data, extra], ignore_index=True))
+
+
+def _load_geojson(geojson_path: str):
+    import geojson
+
+    with open(geojson_path, encoding='utf-8') as f:
+        return geojson.load(f)
+
+
+class LazyGeoJSON(Mapping):
+    """Fault GeoJSON that is only read from disk when it is first accessed"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._data = None
+
+    def _load(self):
+        if self._data is None:
+            self._data = _load_geojson(self.path)
+        return self._data
+
+    def __getitem__(self, key):
+        return self._load()[key]
+
+    def __iter__(self):
+        return iter(self._load())
+
+    def __len__(self):
+        return len(self._load())
+
+    def __bool__(self):
+        # `if gj:` checks in the map functions must not force a load
+        return True
 
+
+def _enrichment_inputs() -> dict:
+    """Config values `enrich_data` depends on, for fingerprinting enriched output"""
+    return {'tuple_columns': TUPLE_COLUMNS_TO_UNPACK, 'distance_mode': DISTANCE_MODE,
+            'fault_defaults': [FAULT_DEFAULT_DIP, FAULT_DEFAULT_UPPER_DEPTH_KM, FAULT_DEFAULT_LOWER_DEPTH_KM]}
+
+
+def _enrichment_code() -> list:
+    return [enrich_data, extract_cities, match_faults_to_earthquakes, find_closest_fault,
+            calculate_distance_by_m_and_km, unpack_tuple_for_most_likely_value, fault_geometry]
+
+
+def _month_files(download_path: str, start: tuple, end: tuple) -> list:
+    """Paths `query_period` writes for every month from `start` to `end` (inclusive)"""
+    (year, month), files = start, []
+    while (year, month) <= tuple(end):
+        files.append(os.path.join(download_path, f"{year}{month:02}.xml"))
+        year, month = (year + 1, 1) if month == 12 else (year, month + 1)
+    return files
+
+
+def data_prep_pipeline(start: tuple = (START_YEAR, START_MONTH), end: tuple = (END_YEAR, END_MONTH),
+                       analyzer: EarthquakeAnalyzer = None, geojson_path: str = GEOJSON_OF_FAULTS_PATH,
+                       cache: StageCache = None):
+    """
+    Download, parse, match faults and enrich, reusing cached stage outputs whose inputs did not change.
+
+    Stages are fingerprinted by their inputs (month files, extra catalogs, the
+    fault GeoJSON, the config values they read and their code), so e.g.
+    changing only HIGH_MAG_THRESHOLD or MAP_MODE and rerunning reuses every stage.
+    """
+    analyzer = analyzer or EarthquakeAnalyzer(download_path="./earthquake_data")
+    cache = cache or StageCache()
+    (start_year, start_month), (end_year, end_month) = start, end
+
+    now = datetime.now()
+    period = {'start': [start_year, start_month], 'end': [end_year, end_month],
+              'download_path': os.path.abspath(analyzer.download_path), 'url': analyzer.url_template}
+    if (end_year, end_month) >= (now.year, now.month):
+        # The current month keeps changing upstream; re-download it at most once per refresh interval
+        period['refresh'] = int(now.timestamp() // STAGE_CACHE_REFRESH_SECONDS)
+    # A cached list that misses a month (failed or empty download) is not reused, so that month is retried;
+    # months after the current one cannot exist yet and are not expected
+    expected = _month_files(analyzer.download_path, start, min(tuple(end), (now.year, now.month)))
+    files, _ = cache.run(
+        'download', lambda: analyzer.query_period(start_year, start_month, end_year, end_month),
+        inputs=period, code=[EarthquakeAnalyzer.query_period],
+        validate=lambda cached: cached == expected and all(os.path.exists(f) for f in cached))
+
+    def parse():
+        return data_prep.merge_extra_catalogs(analyzer.extract_data(files), EXTRA_CATALOG_PATHS)
+    extra_files = [file_fingerprint(p) for p in EXTRA_CATALOG_PATHS]
+    data, parse_key = cache.run(
+        'parse', parse,
+        inputs={'files': [file_fingerprint(f) for f in files], 'extra': extra_files,
+                'dedup': [DEDUP_TIME_TOLERANCE_S, DEDUP_DISTANCE_TOLERANCE_KM, DEDUP_MAGNITUDE_TOLERANCE,
+                          DEDUP_SOURCE_PRIORITY], 'timezone': KANDILLI_TIMEZONE},
+        code=[EarthquakeAnalyzer.extract_data, EarthquakeAnalyzer.iter_extract_data, EarthquakeAnalyzer.parse_events,
+              EarthquakeAnalyzer.parse_event, merge_extra_catalogs, readers, dedup])
+
+    # Fault filtering only depends on the extent of the data, not on the individual events
+    loaded = {}
+    def load_faults():
+        features_df, filtered_features, loaded['gj'] = data_prep.load_and_filter_faults(data, geojson_path)
+        return features_df, filtered_features
+    (features_df, filtered_features), faults_key = cache.run(
+        'faults', load_faults,
+        inputs={'geojson': file_fingerprint(geojson_path), 'extent': list(calculate_fault_coor_limits(data))},
+        code=[load_and_filter_faults, calculate_fault_coor_limits, filter_features_by_bounds, features_to_dataframe])
+
+    data, _ = cache.run(
+        'enrich', lambda: data_prep.enrich_data(data, features_df, DISTANCE_MODE),
+        inputs=_enrichment_inputs(), upstream=[parse_key, faults_key], code=_enrichment_code())
+
+    # On a cache hit the raw GeoJSON is only needed by the maps' fallback when no fault was filtered in
+    gj = loaded['gj'] if 'gj' in loaded else LazyGeoJSON(geojson_path)
     return data, filtered_features, gj
 
+
+# Events parsed per read from a month file in chunked mode; processing chunks are built from these
+READ_BATCH_EVENTS = 5000
+MIN_CHUNK_EVENTS = 1000
+
+
+def _rss_mb() -> float:
+    import psutil
+    return psutil.Process().memory_info().rss / 2**20
+
+
+def chunked_data_prep_pipeline(output_path: str = CHUNKED_OUTPUT_PATH, chunk_size: int = CHUNK_SIZE_EVENTS,
+                               memory_limit_mb: float = MEMORY_LIMIT_MB, files: list = None,
+                               geojson_path: str = GEOJSON_OF_FAULTS_PATH, keep_fault_coordinates: bool = False):
+    """
+    Out-of-core variant of `data_prep_pipeline` for multi-decade date ranges.
+
+    Each month file is streamed in `READ_BATCH_EVENTS` pieces, processed through
+    `enrich_data` either as a whole month (`chunk_size=None`) or in
+    `chunk_size`-event chunks, and appended to a columnar dataset under
+    `output_path/events`. The fault table is written once to
+    `output_path/faults` and, unless `keep_fault_coordinates` is set, the
+    per-event copy of the fault coordinate lists is dropped (join on
+    `closest_fault_idx` instead). When the process RSS goes above
+    `memory_limit_mb` the chunk is flushed early and later chunks are halved.
+    A month file that cannot be parsed is logged and skipped without being
+    marked complete. Months already written from the same month file, fault file, enrichment
+    settings and enrichment code are skipped, so an interrupted run can simply
+    be restarted, while changing e.g. DISTANCE_MODE reprocesses every month.
+    """
+    analyzer = EarthquakeAnalyzer(download_path="./earthquake_data")
+    if files is None:
+        files = analyzer.query_period(start_year=START_YEAR, start_month=START_MONTH, end_year=END_YEAR, end_month=END_MONTH)
+
+    features_df, _, _ = data_prep.load_faults_in_bounds(REGION_BOUNDS, geojson_path)
+    faults = ColumnarDataset(os.path.join(output_path, 'faults'))
+    faults.drop_parts(lambda part: True)
+    faults.append(features_df.reset_index().rename(columns={'index': 'closest_fault_idx'}))
+    month_inputs = {'faults': file_fingerprint(geojson_path), 'region': list(REGION_BOUNDS),
+                    'keep_fault_coordinates': keep_fault_coordinates, **_enrichment_inputs()}
+    month_code = _enrichment_code()
+
+    events = ColumnarDataset(os.path.join(output_path, 'events'))
+    target = chunk_size
+
+    for file_path in files:
+        key = os.path.basename(file_path)
+        done_key = fingerprint('chunked_month', inputs={'file': file_fingerprint(file_path), **month_inputs},
+                               code=month_code)
+        if events.is_complete(key, done_key):
+            print(f"✓ Already processed: {key}")
+            continue
+        events.drop_source(key)
+
+        buffer, buffered, chunk_index = [], 0, 0
+
+        def flush(limit):
+            """Enrich and write the first `limit` buffered events (all of them when `limit` is None)"""
+            nonlocal buffer, buffered, chunk_index
+            data = pd.concat(buffer, ignore_index=True)
+            if limit and len(data) > limit:
+                rest = data.iloc[limit:].reset_index(drop=True)
+                data = data.iloc[:limit]
+                buffer, buffered = [rest], len(rest)
+            else:
+                buffer, buffered = [], 0
+            enriched = data_prep.enrich_data(data, features_df, DISTANCE_MODE)
+            if not keep_fault_coordinates:
+                enriched = enriched.drop(columns=['fault_coordinates'], errors='ignore')
+            events.append(enriched, source={'key': key, 'chunk': chunk_index})
+            chunk_index += 1
+            rows = len(enriched)
+            del data, enriched
+            gc.collect()
+            return rows
+
+        try:
+            for piece in analyzer.iter_extract_data(file_path, min(READ_BATCH_EVENTS, target or READ_BATCH_EVENTS)):
+                buffer.append(piece)
+                buffered += len(piece)
+                over_limit = _rss_mb() > memory_limit_mb
+                # Parts never exceed `target`, even right after it was reduced
+                while buffered and ((target and buffered >= target) or over_limit):
+                    rows = flush(target)
+                    if over_limit and _rss_mb() > memory_limit_mb:
+                        reduced = max(MIN_CHUNK_EVENTS, (target or rows) // 2)
+                        if reduced != target:
+                            target = reduced
+                            print(f"Memory above {memory_limit_mb} MB, chunk size reduced to {target} events")
+                    over_limit = False
+        except (ET.ParseError, OSError) as e:
+            # Leave the month unmarked so a rerun retries it, and drop what was written of it
+            print(f"✗ Error processing {key}: {e}")
+            events.drop_source(key)
+            continue
+        while buffered:
+            flush(target)
+
+        events.mark_complete(key, done_key)
+        print(f"✓ Processed: {key} ({chunk_index} chunk(s), RSS {_rss_mb():.0f} MB)")
+
+    print(f"Total enriched earthquakes on disk: {events.num_rows}")
+    return events
+
+
+def read_enriched_dataset(output_path: str = CHUNKED_OUTPUT_PATH, columns: list = None) -> pd.DataFrame:
+    """Load (a column subset of) the dataset written by `chunked_data_prep_pipeline`"""
+    return ColumnarDataset(os.path.join(output_path, 'events')).read(columns)
@@ -0,0 +1,196 @@
+"""
+Cross-catalog deduplication of earthquake events.
+
+Events are hashed into space-time buckets whose size equals the matching
+tolerances, so any two events that may describe the same earthquake sit in
+the same or in adjacent buckets. Candidate pairs are found by looking up the
+27 neighbouring bucket keys in a sorted key array, which keeps the work close
+to linear in the number of events instead of comparing every pair.
+
+Matched pairs are then resolved one-to-one: a physical event keeps at most
+one row per source, so two nearby events of the same catalog (e.g. in a dense
+aftershock sequence) are never collapsed into one.
+"""
+import numpy as np
+import pandas as pd
+from modules.config import (DEDUP_TIME_TOLERANCE_S, DEDUP_DISTANCE_TOLERANCE_KM, DEDUP_MAGNITUDE_TOLERANCE,
+                            DEDUP_SOURCE_PRIORITY)
+
+
+EARTH_RADIUS_KM = 6371.0
+KM_PER_DEGREE = np.pi * EARTH_RADIUS_KM / 180.0
+
+
+def _haversine_km(lat1, lon1, lat2, lon2):
+    lat1, lon1, lat2, lon2 = map(np.radians, (lat1, lon1, lat2, lon2))
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(a))
+
+
+def candidate_pairs(times_s, lat, lng, time_tol_s: float, dist_tol_km: float):
+    """Index pairs (i < j) of events that share or neighbour a space-time bucket"""
+    n = len(times_s)
+    if n < 2:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+
+    lat_step = dist_tol_km / KM_PER_DEGREE
+    # Longitude degrees shrink towards the poles; size buckets for the widest latitude present
+    max_abs_lat = min(float(np.nanmax(np.abs(lat))), 89.0)
+    lng_step = lat_step / np.cos(np.radians(max_abs_lat))
+
+    t_b = np.floor(times_s / time_tol_s).astype(np.int64)
+    la_b = np.floor(lat / lat_step).astype(np.int64)
+    lo_b = np.floor(lng / lng_step).astype(np.int64)
+    # Pad every axis by one bucket so neighbour offsets never wrap into another row
+    t_b -= t_b.min() - 1
+    la_b -= la_b.min() - 1
+    lo_b -= lo_b.min() - 1
+    n_la = int(la_b.max()) + 2
+    n_lo = int(lo_b.max()) + 2
+    keys = (t_b * n_la + la_b) * n_lo + lo_b
+
+    order = np.argsort(keys, kind='stable')
+    sorted_keys = keys[order]
+
+    left_parts, right_parts = [], []
+    for dt in (-1, 0, 1):
+        for dla in (-1, 0, 1):
+            for dlo in (-1, 0, 1):
+                # Probing with the sorted keys keeps searchsorted's memory access sequential
+                probe = sorted_keys + (dt * n_la + dla) * n_lo + dlo
+                lo = np.searchsorted(sorted_keys, probe, side='left')
+                hi = np.searchsorted(sorted_keys, probe, side='right')
+                counts = hi - lo
+                total = int(counts.sum())
+                if total == 0:
+                    continue
+                left = np.repeat(order, counts)
+                # Position of each candidate inside its bucket run
+                offsets = np.arange(total) - np.repeat(np.cumsum(counts) - counts, counts)
+                right = order[np.repeat(lo, counts) + offsets]
+                keep = left < right
+                left_parts.append(left[keep])
+                right_parts.append(right[keep])
+
+    if not left_parts:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+    return np.concatenate(left_parts), np.concatenate(right_parts)
+
+
+def _first_per(keys, score):
+    """Index of the lowest-score entry for every distinct key (ties go to the earlier entry)"""
+    order = np.lexsort((np.arange(len(keys)), score, keys))
+    first = np.r_[True, keys[order][1:] != keys[order][:-1]]
+    return order[first]
+
+
+def match_one_to_one(rank, left, right, score) -> np.ndarray:
+    """
+    Group rows so that every group holds at most one row per source.
+
+    `rank` orders the sources (lower first), `left`/`right`/`score` are the
+    candidate pairs. Sources are added in rank order: each row of the next
+    source joins the existing group it matches best, provided that group also
+    prefers it over its other candidates from this source (mutual best,
+    repeated until no pair is left). Rows that find no group start their own.
+    """
+    n = len(rank)
+    group = np.full(n, -1, dtype=np.int64)
+    next_group = 0
+    a_all = np.concatenate([left, right])
+    b_all = np.concatenate([right, left])
+    s_all = np.concatenate([score, score])
+    for r in np.unique(rank):
+        rows = np.flatnonzero(rank == r)
+        link = (rank[a_all] == r) & (group[b_all] >= 0)
+        a, g, s = a_all[link], group[b_all[link]], s_all[link]
+        if len(a):
+            # Best score between a row and each group it touches
+            best = _first_per(a * (next_group + 1) + g, s)
+            a, g, s = a[best], g[best], s[best]
+        while len(a):
+            mutual = np.intersect1d(_first_per(a, s), _first_per(g, s))
+            group[a[mutual]] = g[mutual]
+            left_over = ~np.isin(a, a[mutual]) & ~np.isin(g, g[mutual])
+            a, g, s = a[left_over], g[left_over], s[left_over]
+        unmatched = rows[group[rows] < 0]
+        group[unmatched] = next_group + np.arange(len(unmatched))
+        next_group += len(unmatched)
+    return group
+
+
+def deduplicate_events(data: pd.DataFrame, time_tol_s: float = DEDUP_TIME_TOLERANCE_S,
+                       dist_tol_km: float = DEDUP_DISTANCE_TOLERANCE_KM,
+                       mag_tol: float = DEDUP_MAGNITUDE_TOLERANCE,
+                       source_priority: list = DEDUP_SOURCE_PRIORITY) -> pd.DataFrame:
+    """
+    Collapse rows of different sources that describe the same physical event into one row.
+
+    Two rows match when they come from different sources, their origin times
+    differ by at most `time_tol_s`, their epicentres by at most `dist_tol_km`
+    and their magnitudes by at most `mag_tol`. Matches are resolved
+    one-to-one by `match_one_to_one`, closest (normalised time, distance and
+    magnitude difference) first; from each group the row of the
+    highest-priority source is kept, with `event_group`, `n_sources` and
+    `sources` describing the group.
+    """
+    data = data.reset_index(drop=True)
+    if 'timestamp_dt' not in data.columns:
+        data['timestamp_dt'] = pd.NaT
+    missing = data['timestamp_dt'].isna()
+    if missing.any():
+        # Frames concatenated from different readers may carry `timestamp_dt` for only some rows
+        data.loc[missing, 'timestamp_dt'] = pd.to_datetime(data.loc[missing, 'timestamp'], errors='coerce')
+    if 'source' not in data.columns:
+        data['source'] = 'unknown'
+
+    valid = data['timestamp_dt'].notna() & data['latitude'].notna() & data['longitude'].notna()
+    idx = np.flatnonzero(valid.to_numpy())
+    times_s = data['timestamp_dt'].to_numpy(dtype='datetime64[ns]').astype(np.int64)[idx] / 1e9
+    lat = data['latitude'].to_numpy(dtype=float)[idx]
+    lng = data['longitude'].to_numpy(dtype=float)[idx]
+    mag = data['magnitude'].to_numpy(dtype=float)[idx]
+    # Sources outside `source_priority` rank after it, in name order
+    unknown = sorted(set(data['source'].astype(str)) - set(source_priority))
+    rank = {s: i for i, s in enumerate(list(source_priority) + unknown)}
+    row_rank = data['source'].astype(str).map(rank).to_numpy()
+    source_rank = row_rank[idx]
+
+    left, right = candidate_pairs(times_s, lat, lng, time_tol_s, dist_tol_km)
+    dt = np.abs(times_s[left] - times_s[right])
+    dm = np.abs(mag[left] - mag[right])
+    match = (dt <= time_tol_s) & (dm <= mag_tol) & (source_rank[left] != source_rank[right])
+    left, right, dt, dm = left[match], right[match], dt[match], dm[match]
+    km = _haversine_km(lat[left], lng[left], lat[right], lng[right])
+    close = km <= dist_tol_km
+    left, right = left[close], right[close]
+    score = (dt[close] / time_tol_s) ** 2 + (km[close] / dist_tol_km) ** 2 + (dm[close] / mag_tol) ** 2
+
+    n = len(data)
+    valid_groups = match_one_to_one(source_rank, left, right, score)
+    groups = np.empty(n, dtype=np.int64)
+    groups[idx] = valid_groups
+    # Rows without a usable time or position stay on their own
+    invalid = np.setdiff1d(np.arange(n), idx)
+    groups[invalid] = len(idx) + np.arange(len(invalid))
+    n_matched = len(idx) - len(np.unique(valid_groups))
+
+    data['event_group'] = groups
+    data['_priority'] = row_rank
+    # Combine the sources of each group as a bitmask (one bit per source, up to 63 sources) instead of per-group Python
+    codes, names = pd.factorize(data['source'].astype(str), sort=True)
+    bits = np.left_shift(np.int64(1), codes.astype(np.int64))
+    group_mask = np.zeros(groups.max() + 1 if n else 0, dtype=np.int64)
+    np.bitwise_or.at(group_mask, groups, bits)
+    masks = group_mask[groups]
+    labels = {}
+    for mask in np.unique(masks):
+        labels[mask] = [name for i, name in enumerate(names) if mask >> i & 1]
+    data['n_sources'] = pd.Series(masks).map({m: len(v) for m, v in labels.items()}).to_numpy()
+    data['sources'] = pd.Series(masks).map({m: ','.join(v) for m, v in labels.items()}).to_numpy()
+
+    kept = (data.sort_values(['event_group', '_priority', 'timestamp_dt'], kind='stable')
+                .drop_duplicates('event_group', keep='first'))
+    kept = kept.drop(columns=['_priority']).sort_values('timestamp_dt', kind='stable').reset_index(drop=True)
+    print(f"Deduplicated {len(data)} events into {len(kept)} ({n_matched} matched rows)")
+    return kept
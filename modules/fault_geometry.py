@@ -0,0 +1,230 @@
+"""
+Fault planes in 3D and hypocenter-to-fault-surface distances.
+
+Each segment of a fault trace is projected down-dip into a rectangle between
+`upper_seis_depth` and `lower_seis_depth`. GEM traces follow the right-hand
+rule (the fault dips to the right of the trace direction), so the horizontal
+dip direction of a segment is its strike vector turned 90° clockwise and the
+edge at depth z sits z / tan(dip) km away from the trace. The strike and
+down-dip edges of such a rectangle are orthogonal, which makes the closest
+point a pair of independent clamps.
+
+Distances are computed in a local flat frame centred on each event (km east,
+km north, km down), which is accurate at fault-to-event scales. Candidate
+segments come from a KD-tree over segment midpoints: the nearest few bound
+the answer, and only segments whose surface projection could beat that bound
+are evaluated.
+"""
+import numpy as np
+import pandas as pd
+from modules.config import (FAULT_DEFAULT_DIP, FAULT_DEFAULT_UPPER_DEPTH_KM, FAULT_DEFAULT_LOWER_DEPTH_KM,
+                            FAULT_3D_CHUNK_EVENTS, FAULT_3D_NEAREST_SEGMENTS)
+
+
+EARTH_RADIUS_KM = 6371.0
+KM_PER_DEGREE = np.pi * EARTH_RADIUS_KM / 180.0
+RADIUS_CLASSES_KM = [2.5, 5, 10, 20, 40]
+
+
+def _most_likely(features_df: pd.DataFrame, column: str, default: float) -> np.ndarray:
+    from modules.data_prep import unpack_tuple_for_most_likely_value
+
+    if column not in features_df.columns:
+        return np.full(len(features_df), default, dtype=float)
+    values = unpack_tuple_for_most_likely_value(features_df[[column]].copy(), column)[column]
+    return pd.to_numeric(values, errors='coerce').fillna(default).to_numpy(dtype=float)
+
+
+def _trace_parts(coords) -> list:
+    """LineString -> [coords]; nested (MultiLineString/Polygon) -> one list per part"""
+    if not isinstance(coords, (list, tuple)) or len(coords) == 0:
+        return []
+    if isinstance(coords[0], (list, tuple)) and len(coords[0]) > 0 and isinstance(coords[0][0], (list, tuple)):
+        return [part for part in coords if len(part) >= 2]
+    return [coords] if len(coords) >= 2 else []
+
+
+def trace_segments(features_df: pd.DataFrame) -> tuple:
+    """(fault row, lng0, lat0, lng1, lat1) arrays with one entry per straight piece of every fault trace"""
+    fault, lng0, lat0, lng1, lat1 = [], [], [], [], []
+    coords_column = features_df['coordinates'] if 'coordinates' in features_df.columns else []
+    for row, coords in enumerate(coords_column):
+        for part in _trace_parts(coords):
+            pts = np.asarray([p[:2] for p in part], dtype=float)
+            fault.extend([row] * (len(pts) - 1))
+            lng0.extend(pts[:-1, 0])
+            lat0.extend(pts[:-1, 1])
+            lng1.extend(pts[1:, 0])
+            lat1.extend(pts[1:, 1])
+    return (np.asarray(fault, dtype=np.int64), np.asarray(lng0, dtype=float), np.asarray(lat0, dtype=float),
+            np.asarray(lng1, dtype=float), np.asarray(lat1, dtype=float))
+
+
+def to_xyz(lat, lng):
+    lat, lng = np.radians(lat), np.radians(lng)
+    return EARTH_RADIUS_KM * np.stack([np.cos(lat) * np.cos(lng), np.cos(lat) * np.sin(lng), np.sin(lat)], axis=-1)
+
+
+class FaultPlanes:
+    """Down-dip rectangles for every trace segment of a fault table"""
+
+    def __init__(self, features_df: pd.DataFrame):
+        from scipy.spatial import cKDTree
+
+        dip = np.clip(_most_likely(features_df, 'average_dip', FAULT_DEFAULT_DIP), 1.0, 90.0)
+        upper = _most_likely(features_df, 'upper_seis_depth', FAULT_DEFAULT_UPPER_DEPTH_KM)
+        lower = np.maximum(_most_likely(features_df, 'lower_seis_depth', FAULT_DEFAULT_LOWER_DEPTH_KM), upper)
+
+        self.index = features_df.index
+        self.segment_fault, self.lng0, self.lat0, self.lng1, self.lat1 = trace_segments(features_df)
+        self.z_top = upper[self.segment_fault]
+        self.z_bot = lower[self.segment_fault]
+        self.cot_dip = 1.0 / np.tan(np.radians(dip[self.segment_fault]))
+
+        # Centre of each rectangle's surface projection: the trace midpoint moved half-way down-dip
+        mid_lat = (self.lat0 + self.lat1) / 2
+        mid_lng = (self.lng0 + self.lng1) / 2
+        cos_mid = np.cos(np.radians(mid_lat))
+        sx = (self.lng1 - self.lng0) * KM_PER_DEGREE * cos_mid
+        sy = (self.lat1 - self.lat0) * KM_PER_DEGREE
+        length = np.hypot(sx, sy)
+        safe = np.where(length > 0, length, 1.0)
+        h_mid = (self.z_top + self.z_bot) / 2 * self.cot_dip
+        centre_lat = mid_lat - sx / safe * h_mid / KM_PER_DEGREE
+        centre_lng = mid_lng + sy / safe * h_mid / (KM_PER_DEGREE * cos_mid)
+        # Every point of the projected rectangle lies within this horizontal distance of its centre
+        self.radius = np.hypot(length / 2, (self.z_bot - self.z_top) * self.cot_dip / 2)
+
+        # Horizontal distance never exceeds 3D distance, so a segment can only beat a bound `d` if
+        # its centre is within `d + radius` of the epicentre. Grouping segments by radius keeps
+        # the few wide, shallow-dipping planes from inflating the search for all the others.
+        self.groups = []
+        classes = np.digitize(self.radius, RADIUS_CLASSES_KM)
+        for c in np.unique(classes):
+            members = np.flatnonzero(classes == c)
+            self.groups.append((members, float(self.radius[members].max()),
+                                cKDTree(to_xyz(centre_lat[members], centre_lng[members]))))
+        self.tree = cKDTree(to_xyz(centre_lat, centre_lng)) if len(centre_lat) else None
+
+    def __len__(self):
+        return len(self.segment_fault)
+
+    def pair_distances(self, ev_lat, ev_lng, ev_depth, seg) -> np.ndarray:
+        """Distance (km) from each hypocenter to the rectangle of the paired segment"""
+        cos_lat = np.cos(np.radians(ev_lat))
+        # Segment end points in a flat frame centred on the event, km east/north
+        x0 = (self.lng0[seg] - ev_lng) * KM_PER_DEGREE * cos_lat
+        y0 = (self.lat0[seg] - ev_lat) * KM_PER_DEGREE
+        x1 = (self.lng1[seg] - ev_lng) * KM_PER_DEGREE * cos_lat
+        y1 = (self.lat1[seg] - ev_lat) * KM_PER_DEGREE
+
+        sx, sy = x1 - x0, y1 - y0
+        length = np.hypot(sx, sy)
+        safe = np.where(length > 0, length, 1.0)
+        # Right-hand rule: dip direction is the strike turned clockwise
+        dx, dy = sy / safe, -sx / safe
+
+        z_top, z_bot = self.z_top[seg], self.z_bot[seg]
+        h_top = z_top * self.cot_dip[seg]
+        h_bot = z_bot * self.cot_dip[seg]
+
+        # Corner A (top edge, start of segment); u along strike, v down-dip
+        ax, ay, az = x0 + dx * h_top, y0 + dy * h_top, z_top
+        ux, uy = sx, sy
+        vx, vy, vz = dx * (h_bot - h_top), dy * (h_bot - h_top), z_bot - z_top
+
+        px, py, pz = -ax, -ay, ev_depth - az
+        uu = ux * ux + uy * uy
+        vv = vx * vx + vy * vy + vz * vz
+        a = np.clip(np.where(uu > 0, (px * ux + py * uy) / np.where(uu > 0, uu, 1.0), 0.0), 0.0, 1.0)
+        b = np.clip(np.where(vv > 0, (px * vx + py * vy + pz * vz) / np.where(vv > 0, vv, 1.0), 0.0), 0.0, 1.0)
+
+        cx = px - a * ux - b * vx
+        cy = py - a * uy - b * vy
+        cz = pz - b * vz
+        return np.sqrt(cx * cx + cy * cy + cz * cz)
+
+    def closest(self, lat, lng, depth):
+        """(fault row, distance km) of the closest fault surface to each hypocenter"""
+        n = len(lat)
+        best_row = np.full(n, -1, dtype=np.int64)
+        best_dist = np.full(n, np.inf)
+        if self.tree is None or n == 0:
+            return best_row, best_dist
+
+        xyz = to_xyz(lat, lng)
+        k = min(FAULT_3D_NEAREST_SEGMENTS, len(self))
+        _, near = self.tree.query(xyz, k=k)
+        near = near.reshape(n, k)
+
+        # Upper bound from the nearest rectangle centres
+        ev = np.repeat(np.arange(n), k)
+        seg = near.ravel()
+        dist = self.pair_distances(lat[ev], lng[ev], depth[ev], seg).reshape(n, k)
+        pick = np.argmin(dist, axis=1)
+        best_dist = dist[np.arange(n), pick]
+        best_seg = near[np.arange(n), pick]
+
+        # Segments of each radius class whose centre could still be close enough to beat the bound
+        for members, radius, tree in self.groups:
+            # Small slack covers the flat-frame approximation used by `pair_distances`
+            candidates = tree.query_ball_point(xyz, r=(best_dist + radius) * 1.01 + 0.1, return_sorted=False)
+            counts = np.fromiter((len(c) for c in candidates), dtype=np.int64, count=n)
+            total = int(counts.sum())
+            if total == 0:
+                continue
+            ev = np.repeat(np.arange(n), counts)
+            seg = members[np.fromiter((s for c in candidates for s in c), dtype=np.int64, count=total)]
+            dist = self.pair_distances(lat[ev], lng[ev], depth[ev], seg)
+            order = np.lexsort((dist, ev))
+            ev, seg, dist = ev[order], seg[order], dist[order]
+            first = np.flatnonzero(np.r_[True, ev[1:] != ev[:-1]])
+            better = dist[first] < best_dist[ev[first]]
+            best_dist[ev[first][better]] = dist[first][better]
+            best_seg[ev[first][better]] = seg[first][better]
+
+        best_row = self.segment_fault[best_seg]
+        return best_row, best_dist
+
+
+_planes_cache = {}
+
+
+def planes_for(features_df: pd.DataFrame) -> FaultPlanes:
+    """FaultPlanes for `features_df`, reused while the same fault table is passed in (chunked/incremental runs)"""
+    cached = _planes_cache.get('planes')
+    if cached is None or _planes_cache.get('features_df') is not features_df:
+        cached = FaultPlanes(features_df)
+        _planes_cache.update(features_df=features_df, planes=cached)
+    return cached
+
+
+def calculate_3d_distance_to_fault(features_df: pd.DataFrame, data: pd.DataFrame,
+                                   planes: FaultPlanes = None) -> pd.DataFrame:
+    """
+    Add `closest_fault_3d_idx`, `closest_fault_3d_catalog_id` and `distance_to_fault_3d_km`
+    (hypocenter to the nearest fault surface, using `depth`) to `data`.
+    """
+    planes = planes or planes_for(features_df)
+    lat = data['latitude'].to_numpy(dtype=float)
+    lng = data['longitude'].to_numpy(dtype=float)
+    depth = pd.to_numeric(data['depth'], errors='coerce').fillna(0.0).to_numpy(dtype=float)
+    valid = np.flatnonzero(~(np.isnan(lat) | np.isnan(lng)))
+
+    rows = np.full(len(data), -1, dtype=np.int64)
+    dist = np.full(len(data), np.nan)
+    for start in range(0, len(valid), FAULT_3D_CHUNK_EVENTS):
+        sel = valid[start:start + FAULT_3D_CHUNK_EVENTS]
+        rows[sel], dist[sel] = planes.closest(lat[sel], lng[sel], depth[sel])
+
+    found = rows >= 0
+    fault_idx = pd.array(np.zeros(len(data), dtype=np.int64), dtype='Int64')
+    fault_idx[found] = np.asarray(planes.index)[rows[found]]
+    fault_idx[~found] = pd.NA
+    data['closest_fault_3d_idx'] = fault_idx
+    if 'catalog_id' in features_df.columns:
+        catalog_ids = np.full(len(data), None, dtype=object)
+        catalog_ids[found] = features_df['catalog_id'].to_numpy(dtype=object)[rows[found]]
+        data['closest_fault_3d_catalog_id'] = catalog_ids
+    data['distance_to_fault_3d_km'] = np.where(np.isfinite(dist), np.round(dist, 2), np.nan)
+    return data
@@ -0,0 +1,260 @@
+import os
+import time
+import threading
+from collections import deque
+from datetime import datetime, timezone
+import numpy as np
+import pandas as pd
+import modules.data_prep as data_prep
+from modules.model import EarthquakeAnalyzer
+from modules.config import (GEOJSON_OF_FAULTS_PATH, INGEST_POLL_INTERVAL_SECONDS, INGEST_STATE_PATH,
+                            REGION_BOUNDS, KANDILLI_TIMEZONE, INGEST_KEEP_BATCHES,
+                            INGEST_METRIC_SAMPLES)
+
+
+def event_keys(data: pd.DataFrame) -> pd.Series:
+    """Stable per-event key built from timestamp, latitude, longitude and magnitude"""
+    if data.empty:
+        return pd.Series([], dtype=object, index=data.index)
+    return (data['timestamp'].astype(str)
+            + '|' + data['latitude'].map('{:.4f}'.format)
+            + '|' + data['longitude'].map('{:.4f}'.format)
+            + '|' + data['magnitude'].map('{:.1f}'.format))
+
+
+class IngestionMetrics:
+    """Counters and the latest `max_samples` latency samples collected by the ingestion daemon"""
+
+    def __init__(self, max_samples: int = INGEST_METRIC_SAMPLES):
+        self.polls = 0
+        self.not_modified = 0
+        self.errors = 0
+        self.bytes_downloaded = 0
+        self.new_events = 0
+        self.feed_to_enriched_s = deque(maxlen=max_samples)
+        self.origin_to_enriched_s = deque(maxlen=max_samples)
+        self.poll_durations_s = deque(maxlen=max_samples)
+
+    @staticmethod
+    def _percentiles(values):
+        if not values:
+            return {'count': 0}
+        arr = np.asarray(values, dtype=float)
+        return {
+            'count': int(arr.size),
+            'p50': float(np.percentile(arr, 50)),
+            'p95': float(np.percentile(arr, 95)),
+            'p99': float(np.percentile(arr, 99)),
+            'max': float(arr.max()),
+        }
+
+    def summary(self) -> dict:
+        return {
+            'polls': self.polls,
+            'not_modified': self.not_modified,
+            'errors': self.errors,
+            'bytes_downloaded': self.bytes_downloaded,
+            'new_events': self.new_events,
+            'feed_to_enriched_s': self._percentiles(self.feed_to_enriched_s),
+            'origin_to_enriched_s': self._percentiles(self.origin_to_enriched_s),
+            'poll_duration_s': self._percentiles(self.poll_durations_s),
+        }
+
+
+class IngestionDaemon:
+    """
+    Poll the current-month Kandilli feed and enrich only events that were not seen before.
+
+    Each poll downloads the month file (with a conditional GET so an unchanged
+    feed costs no transfer), keys every event by timestamp+lat+lng+mag, runs
+    the new ones through `data_prep.enrich_data` and hands the enriched batch
+    to `on_batch`. Seen keys are kept per month and persisted under
+    `state_path`, so a restart does not re-enrich the month. When the month
+    rolls over the previous month is polled one last time before switching.
+    Only the last `keep_batches` batches stay in memory (`catalog`);
+    consumers that need every event should collect them in `on_batch`.
+    """
+
+    def __init__(self, features_df: pd.DataFrame = None, analyzer: EarthquakeAnalyzer = None,
+                 poll_interval: float = INGEST_POLL_INTERVAL_SECONDS, state_path: str = INGEST_STATE_PATH,
+                 on_batch=None, clock=datetime.now, keep_batches: int = INGEST_KEEP_BATCHES):
+        import requests
+
+        self.analyzer = analyzer or EarthquakeAnalyzer(download_path="./earthquake_data")
+        if features_df is None:
+            features_df, _, _ = data_prep.load_faults_in_bounds(REGION_BOUNDS, GEOJSON_OF_FAULTS_PATH)
+        self.features_df = features_df
+        self.poll_interval = poll_interval
+        self.state_path = state_path
+        self.on_batch = on_batch
+        self.clock = clock
+        self.metrics = IngestionMetrics()
+        self.batches = deque(maxlen=keep_batches)
+
+        self._session = requests.Session()
+        self._session.headers.update(self.analyzer.headers)
+        self._validators = {}
+        self._seen = {}
+        self._month = None
+        self._finishing = set()
+        self._stop = threading.Event()
+        os.makedirs(state_path, exist_ok=True)
+
+    def _seen_file(self, year: int, month: int) -> str:
+        return os.path.join(self.state_path, f"seen_{year}{month:02}.txt")
+
+    def _seen_keys(self, year: int, month: int) -> set:
+        if (year, month) not in self._seen:
+            keys = set()
+            path = self._seen_file(year, month)
+            if os.path.exists(path):
+                with open(path, encoding='utf-8') as f:
+                    keys = set(line.rstrip('\n') for line in f)
+            self._seen[(year, month)] = keys
+        return self._seen[(year, month)]
+
+    def _mark_seen(self, year: int, month: int, keys):
+        self._seen_keys(year, month).update(keys)
+        with open(self._seen_file(year, month), 'a', encoding='utf-8') as f:
+            f.writelines(f"{k}\n" for k in keys)
+
+    def mark_seen(self, data: pd.DataFrame):
+        """
+        Record events that consumers already have, so they are not enriched and handed to `on_batch` again.
+
+        Call it with the catalog that `on_batch` consumers were built from
+        (e.g. `CatalogStatistics` seeded from `data_prep_pipeline`), before
+        the first poll.
+        """
+        if data.empty:
+            return
+        keys = event_keys(data)
+        times = pd.to_datetime(data['timestamp'], format='%Y.%m.%d %H:%M:%S', errors='coerce')
+        for (year, month), month_keys in keys.groupby([times.dt.year, times.dt.month]):
+            year, month = int(year), int(month)
+            self._mark_seen(year, month, set(month_keys) - self._seen_keys(year, month))
+
+    def _fetch(self, year: int, month: int):
+        """Return the month document, or None when the feed has not changed since the last poll"""
+        url = self.analyzer.month_url(year, month)
+        headers = {}
+        etag, last_modified = self._validators.get(url, (None, None))
+        if etag:
+            headers['If-None-Match'] = etag
+        if last_modified:
+            headers['If-Modified-Since'] = last_modified
+
+        response = self._session.get(url, headers=headers, timeout=10)
+        if response.status_code == 304:
+            self.metrics.not_modified += 1
+            return None
+        response.raise_for_status()
+        self._validators[url] = (response.headers.get('ETag'), response.headers.get('Last-Modified'))
+        self.metrics.bytes_downloaded += len(response.content)
+
+        if len(response.content) < 100:
+            return None
+        file_name = os.path.join(self.analyzer.download_path, f"{year}{month:02}.xml")
+        with open(file_name, "wb") as f:
+            f.write(response.content)
+        return response.content
+
+    def poll_month(self, year: int, month: int) -> pd.DataFrame:
+        """Fetch one month, enrich the unseen events and return them (empty if none)"""
+        fetched_at = time.perf_counter()
+        content = self._fetch(year, month)
+        if content is None:
+            return pd.DataFrame()
+
+        events = self.analyzer.parse_content(content)
+        if events.empty:
+            return events
+        keys = event_keys(events)
+        seen = self._seen_keys(year, month)
+        is_new = ~keys.isin(seen) & ~keys.duplicated()
+        new_events = events[is_new.values].reset_index(drop=True)
+        if new_events.empty:
+            return new_events
+
+        enriched = data_prep.enrich_data(new_events, self.features_df)
+        enriched['event_key'] = keys[is_new.values].values
+        enriched_at = time.perf_counter()
+
+        self._mark_seen(year, month, enriched['event_key'])
+        self.metrics.new_events += len(enriched)
+        self.metrics.feed_to_enriched_s.extend([enriched_at - fetched_at] * len(enriched))
+        origin = enriched['timestamp_dt'].dt.tz_localize(KANDILLI_TIMEZONE, ambiguous='NaT', nonexistent='NaT')
+        # Naive clock values are taken as local time, as datetime.now returns them
+        now = pd.Timestamp(self.clock().astimezone(timezone.utc))
+        age = (now - origin).dt.total_seconds()
+        self.metrics.origin_to_enriched_s.extend(age.dropna().tolist())
+
+        self.batches.append(enriched)
+        if self.on_batch is not None:
+            self.on_batch(enriched)
+        return enriched
+
+    def _poll_safely(self, year: int, month: int):
+        """`poll_month`, or None (counted as an error) when it fails"""
+        try:
+            return self.poll_month(year, month)
+        except Exception as e:
+            self.metrics.errors += 1
+            print(f"✗ Ingestion error {year}-{month:02}: {e}")
+            return None
+
+    def poll_once(self) -> pd.DataFrame:
+        now = self.clock()
+        current = (now.year, now.month)
+        start = time.perf_counter()
+        self.metrics.polls += 1
+        batches = []
+        if self._month != current:
+            if self._month is not None:
+                self._finishing.add(self._month)
+            self._month = current
+        # Catch events published late into months that ended; each is retried until it succeeds,
+        # and a failure there does not block the current month
+        for month in sorted(self._finishing):
+            batch = self._poll_safely(*month)
+            if batch is not None:
+                batches.append(batch)
+                self._finishing.discard(month)
+                self._seen.pop(month, None)
+        batch = self._poll_safely(*current)
+        if batch is not None:
+            batches.append(batch)
+        self.metrics.poll_durations_s.append(time.perf_counter() - start)
+
+        batches = [b for b in batches if not b.empty]
+        new = pd.concat(batches, ignore_index=True) if batches else pd.DataFrame()
+        if not new.empty:
+            print(f"✓ {len(new)} new events ingested")
+        return new
+
+    @property
+    def catalog(self) -> pd.DataFrame:
+        """Events of the most recent `keep_batches` batches enriched by this daemon"""
+        if not self.batches:
+            return pd.DataFrame()
+        return pd.concat(list(self.batches), ignore_index=True)
+
+    def run(self, max_polls: int = None):
+        """Poll until `stop()` is called (or `max_polls` polls have run)"""
+        self._stop.clear()
+        polls = 0
+        while not self._stop.is_set():
+            started = time.monotonic()
+            self.poll_once()
+            polls += 1
+            if max_polls is not None and polls >= max_polls:
+                break
+            self._stop.wait(max(0.0, self.poll_interval - (time.monotonic() - started)))
+
+    def start(self) -> threading.Thread:
+        thread = threading.Thread(target=self.run, name='kandilli-ingestion', daemon=True)
+        thread.start()
+        return thread
+
+    def stop(self):
+        self._stop.set()
@@ -1,25 +1,27 @@
 import os
 from datetime import datetime
 import pandas as pd
-import requests
 from xml.etree import ElementTree as ET
+from modules.config import KANDILLI_URL_TEMPLATE
 
 
 
 class EarthquakeAnalyzer:
-    def __init__(self, download_path: str = "./fault_data"):
+    headers = {
+        'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
+    }
+
+    def __init__(self, download_path: str = "./fault_data", url_template: str = KANDILLI_URL_TEMPLATE):
         self.download_path = download_path
+        self.url_template = url_template
         if not os.path.exists(download_path):
             os.mkdir(download_path)
     
     def query_period(self, start_year: int, start_month: int, end_year: int, end_month: int) -> list:
         """Download earthquake data for a specific period"""
+        import requests
+
         downloaded_files = []
-        
-        headers = {
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
-        }
-        
        
         now = datetime.now()
         current_year = now.year
@@ -40,10 +42,10 @@ class EarthquakeAnalyzer:
                     downloaded_files.append(file_name)
                     continue
                 
-                url = f"http://udim.koeri.boun.edu.tr/zeqmap/xmlt/{year}{month:02}.xml"
+                url = self.month_url(year, month)
                 
                 try:
-                    response = requests.get(url, headers=headers, timeout=10)
+                    response = requests.get(url, headers=self.headers, timeout=10)
                     response.raise_for_status()
                     
                     if len(response.content) < 100:
@@ -62,6 +64,62 @@ class EarthquakeAnalyzer:
         
         return downloaded_files
         
+    def month_url(self, year: int, month: int) -> str:
+        return self.url_template.format(year=year, month=month)
+
+    @staticmethod
+    def parse_event(event) -> dict:
+        """Event dict for one `earhquake` element, or None when it has no magnitude"""
+        magnitude = float(event.get("mag", 0))
+        latitude = float(event.get("lat", 0))
+        longitude = float(event.get("lng", 0))
+        depth = float(event.get("Depth", 0))
+        timestamp = event.get("name", "")
+        location = event.get("lokasyon", "").strip()
+        
+        if magnitude > 0:
+            return {
+                "timestamp": timestamp,
+                "location": location,
+                "magnitude": magnitude,
+                "latitude": latitude,
+                "longitude": longitude,
+                "depth": depth
+            }
+        return None
+
+    @classmethod
+    def parse_events(cls, root) -> list:
+        """Turn the `earhquake` elements of a Kandilli XML root into event dicts"""
+        earthquakes = []
+        for event in root.findall("earhquake"):
+            record = cls.parse_event(event)
+            if record is not None:
+                earthquakes.append(record)
+        return earthquakes
+
+    @classmethod
+    def iter_extract_data(cls, file_path: str, chunk_size: int = None):
+        """Yield DataFrames of at most `chunk_size` events from one XML file without building the whole tree"""
+        earthquakes = []
+        for _, event in ET.iterparse(file_path, events=("end",)):
+            if event.tag != "earhquake":
+                continue
+            record = cls.parse_event(event)
+            event.clear()
+            if record is not None:
+                earthquakes.append(record)
+            if chunk_size and len(earthquakes) >= chunk_size:
+                yield pd.DataFrame.from_dict(earthquakes)
+                earthquakes = []
+        if earthquakes:
+            yield pd.DataFrame.from_dict(earthquakes)
+
+    def parse_content(self, content: bytes) -> pd.DataFrame:
+        """Analyze earthquake data from an XML document already held in memory"""
+        root = ET.fromstring(content)
+        return pd.DataFrame.from_dict(self.parse_events(root))
+        
     def extract_data(self, file_paths: list) -> dict:
         """Analyze earthquake data from XML files"""
         earthquakes = []
@@ -70,29 +128,11 @@ class EarthquakeAnalyzer:
             try:
                 tree = ET.parse(file_path)
                 root = tree.getroot()
-                
-                
-                for event in root.findall("earhquake"):
-                    magnitude = float(event.get("mag", 0))
-                    latitude = float(event.get("lat", 0))
-                    longitude = float(event.get("lng", 0))
-                    depth = float(event.get("Depth", 0))
-                    timestamp = event.get("name", "")
-                    location = event.get("lokasyon", "").strip()
-                    
-                    if magnitude > 0:
-                        earthquakes.append({
-                            "timestamp": timestamp,
-                            "location": location,
-                            "magnitude": magnitude,
-                            "latitude": latitude,
-                            "longitude": longitude,
-                            "depth": depth
-                        })
+                earthquakes.extend(self.parse_events(root))
             except Exception as e:
                 print(f"Error parsing {file_path}: {e}")
         
         
         earthquakes = pd.DataFrame.from_dict(earthquakes)
         print(f"Total earthquakes: {len(earthquakes)}")
-        return earthquakes
\ No newline at end of file
+        return earthquakes
@@ -0,0 +1,369 @@
+"""
+Local HTTP query service over the enriched catalog produced by `data_prep_pipeline`.
+
+Endpoints (all GET, JSON responses):
+
+- `/events?bbox=min_lat,min_lng,max_lat,max_lng&start=...&end=...&min_mag=...&max_mag=...&catalog_id=...&limit=...`
+- `/faults` - per-fault statistics for every `catalog_id`
+- `/faults/<catalog_id>` - statistics for one fault
+- `/health`
+
+Queries are answered from in-memory indexes (time- and magnitude-sorted
+arrays, a lat/lng grid and per-fault row lists) and the encoded responses are
+kept in an LRU cache until the catalog is replaced with `update`.
+"""
+import asyncio
+import json
+import math
+from collections import OrderedDict
+from urllib.parse import urlsplit, parse_qsl, unquote
+import numpy as np
+import pandas as pd
+from modules.config import QUERY_HOST, QUERY_PORT, QUERY_CACHE_SIZE, QUERY_GRID_CELL_DEG, QUERY_MAX_RESULTS
+
+
+# Only responses derived from the catalog are cached; `/health` reports live counters
+CACHED_PATHS = ('/events', '/faults')
+
+EVENT_COLUMNS = ['timestamp', 'location', 'city', 'magnitude', 'latitude', 'longitude', 'depth',
+                 'catalog_id', 'slip_type', 'distance_to_fault_km']
+
+
+class QueryError(ValueError):
+    """Raised for malformed query parameters; served as HTTP 400"""
+
+
+class CatalogIndex:
+    """Read-only indexes over an enriched catalog DataFrame"""
+
+    def __init__(self, data: pd.DataFrame, cell_deg: float = QUERY_GRID_CELL_DEG):
+        data = data.reset_index(drop=True)
+        if 'timestamp_dt' not in data.columns:
+            data['timestamp_dt'] = pd.to_datetime(data['timestamp'], errors='coerce')
+        self.data = data
+        self.columns = [c for c in EVENT_COLUMNS if c in data.columns]
+        self.cell_deg = cell_deg
+        self.size = len(data)
+
+        lat = data['latitude'].to_numpy(dtype=float)
+        lng = data['longitude'].to_numpy(dtype=float)
+        self.lat, self.lng = lat, lng
+
+        times = data['timestamp_dt'].to_numpy(dtype='datetime64[ns]').astype(np.int64)
+        self.time_order = np.argsort(times, kind='stable')
+        self.time_sorted = times[self.time_order]
+        self.times = times
+
+        mags = data['magnitude'].to_numpy(dtype=float)
+        self.mag_order = np.argsort(mags, kind='stable')
+        self.mag_sorted = mags[self.mag_order]
+        self.mags = mags
+
+        cells = self._cells(lat, lng)
+        self.grid = {}
+        if self.size:
+            order = np.lexsort((cells[1], cells[0]))
+            keys = np.stack([cells[0][order], cells[1][order]], axis=1)
+            starts = np.flatnonzero(np.r_[True, np.any(keys[1:] != keys[:-1], axis=1)])
+            for start, stop in zip(starts, np.r_[starts[1:], len(order)]):
+                self.grid[(int(keys[start, 0]), int(keys[start, 1]))] = order[start:stop]
+
+        self.fault_rows = {}
+        if 'catalog_id' in data.columns:
+            for catalog_id, rows in data.groupby(data['catalog_id'].astype(str)).indices.items():
+                if catalog_id not in ('', 'nan', 'None'):
+                    self.fault_rows[catalog_id] = rows
+        self.fault_stats = {cid: self._fault_stats(cid, rows) for cid, rows in self.fault_rows.items()}
+
+    def _cells(self, lat, lng):
+        return (np.floor(lat / self.cell_deg).astype(np.int64), np.floor(lng / self.cell_deg).astype(np.int64))
+
+    def _fault_stats(self, catalog_id, rows):
+        sub = self.data.iloc[rows]
+        stats = {
+            'catalog_id': catalog_id,
+            'event_count': int(len(rows)),
+            'max_magnitude': float(sub['magnitude'].max()),
+            'mean_magnitude': round(float(sub['magnitude'].mean()), 3),
+            'mean_depth': round(float(sub['depth'].mean()), 3) if 'depth' in sub else None,
+            'first_event': str(sub['timestamp_dt'].min()),
+            'last_event': str(sub['timestamp_dt'].max()),
+        }
+        if 'distance_to_fault_km' in sub:
+            stats['mean_distance_to_fault_km'] = round(float(sub['distance_to_fault_km'].mean()), 3)
+        if 'slip_type' in sub:
+            stats['slip_type'] = sub['slip_type'].iloc[0] if pd.notna(sub['slip_type'].iloc[0]) else None
+        return stats
+
+    def _bbox_rows(self, min_lat, min_lng, max_lat, max_lng):
+        (c0, c2), (c1, c3) = self._cells(np.array([min_lat, max_lat]), np.array([min_lng, max_lng]))
+        n_cells = (c2 - c0 + 1) * (c3 - c1 + 1)
+        if n_cells > len(self.grid):
+            parts = [rows for (i, j), rows in self.grid.items() if c0 <= i <= c2 and c1 <= j <= c3]
+        else:
+            parts = [self.grid[(i, j)] for i in range(c0, c2 + 1) for j in range(c1, c3 + 1) if (i, j) in self.grid]
+        if not parts:
+            return np.empty(0, dtype=np.int64)
+        rows = np.concatenate(parts)
+        keep = ((self.lat[rows] >= min_lat) & (self.lat[rows] <= max_lat)
+                & (self.lng[rows] >= min_lng) & (self.lng[rows] <= max_lng))
+        return rows[keep]
+
+    def query(self, bbox=None, start=None, end=None, min_mag=None, max_mag=None, catalog_id=None,
+              limit: int = QUERY_MAX_RESULTS) -> dict:
+        """Row indices matching every given filter, most recent first"""
+        # Each index yields a candidate set; start from the smallest and mask the rest on it
+        candidates = []
+        if catalog_id is not None:
+            candidates.append(self.fault_rows.get(str(catalog_id), np.empty(0, dtype=np.int64)))
+        if start is not None or end is not None:
+            lo = 0 if start is None else np.searchsorted(self.time_sorted, start, side='left')
+            hi = self.size if end is None else np.searchsorted(self.time_sorted, end, side='right')
+            candidates.append(self.time_order[lo:hi])
+        if min_mag is not None or max_mag is not None:
+            lo = 0 if min_mag is None else np.searchsorted(self.mag_sorted, min_mag, side='left')
+            hi = self.size if max_mag is None else np.searchsorted(self.mag_sorted, max_mag, side='right')
+            candidates.append(self.mag_order[lo:hi])
+        if bbox is not None:
+            candidates.append(self._bbox_rows(*bbox))
+
+        if candidates:
+            rows = min(candidates, key=len)
+        else:
+            rows = self.time_order
+
+        keep = np.ones(len(rows), dtype=bool)
+        if start is not None:
+            keep &= self.times[rows] >= start
+        if end is not None:
+            keep &= self.times[rows] <= end
+        if min_mag is not None:
+            keep &= self.mags[rows] >= min_mag
+        if max_mag is not None:
+            keep &= self.mags[rows] <= max_mag
+        if bbox is not None:
+            min_lat, min_lng, max_lat, max_lng = bbox
+            keep &= ((self.lat[rows] >= min_lat) & (self.lat[rows] <= max_lat)
+                     & (self.lng[rows] >= min_lng) & (self.lng[rows] <= max_lng))
+        if catalog_id is not None and 'catalog_id' in self.data.columns:
+            keep &= np.isin(rows, self.fault_rows.get(str(catalog_id), np.empty(0, dtype=np.int64)))
+        rows = rows[keep]
+
+        total = len(rows)
+        rows = rows[np.argsort(-self.times[rows], kind='stable')][:limit]
+        return {'total': int(total), 'rows': rows}
+
+    def records(self, rows) -> list:
+        sub = self.data.iloc[rows][self.columns]
+        return json.loads(sub.to_json(orient='records'))
+
+
+def _parse_float(params, name):
+    if name not in params or params[name] == '':
+        return None
+    try:
+        value = float(params[name])
+    except ValueError:
+        raise QueryError(f"{name} must be a number")
+    if not np.isfinite(value):
+        raise QueryError(f"{name} must be a finite number")
+    return value
+
+
+def _parse_int(params, name):
+    if name not in params or params[name] == '':
+        return None
+    try:
+        return int(params[name])
+    except ValueError:
+        raise QueryError(f"{name} must be an integer")
+
+
+def _parse_time(params, name):
+    if name not in params or params[name] == '':
+        return None
+    ts = pd.to_datetime(params[name], errors='coerce')
+    if pd.isna(ts):
+        raise QueryError(f"{name} is not a valid date/time")
+    return np.datetime64(ts.to_datetime64(), 'ns').astype(np.int64)
+
+
+def parse_event_query(params: dict) -> dict:
+    """Validate `/events` parameters into keyword arguments for `CatalogIndex.query`"""
+    query = {}
+    if params.get('bbox'):
+        parts = params['bbox'].split(',')
+        if len(parts) != 4:
+            raise QueryError("bbox must be min_lat,min_lng,max_lat,max_lng")
+        try:
+            query['bbox'] = tuple(float(p) for p in parts)
+        except ValueError:
+            raise QueryError("bbox must be min_lat,min_lng,max_lat,max_lng")
+        if not np.isfinite(query['bbox']).all():
+            raise QueryError("bbox must be finite numbers")
+    query['start'] = _parse_time(params, 'start')
+    query['end'] = _parse_time(params, 'end')
+    query['min_mag'] = _parse_float(params, 'min_mag')
+    query['max_mag'] = _parse_float(params, 'max_mag')
+    if params.get('catalog_id'):
+        query['catalog_id'] = params['catalog_id']
+    limit = _parse_int(params, 'limit')
+    query['limit'] = QUERY_MAX_RESULTS if limit is None else max(0, min(limit, QUERY_MAX_RESULTS))
+    return query
+
+
+def _json_safe(value):
+    """Replace NaN/inf (e.g. a mean over no distances) with None, which JSON can represent"""
+    if isinstance(value, float):
+        return value if math.isfinite(value) else None
+    if isinstance(value, dict):
+        return {k: _json_safe(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_json_safe(v) for v in value]
+    return value
+
+
+def encode(payload) -> bytes:
+    return json.dumps(_json_safe(payload), default=str, allow_nan=False).encode('utf-8')
+
+
+class QueryService:
+    """Routes requests to a `CatalogIndex` and caches encoded responses"""
+
+    def __init__(self, data: pd.DataFrame, cache_size: int = QUERY_CACHE_SIZE):
+        self.cache_size = cache_size
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.update(data)
+
+    def update(self, data: pd.DataFrame):
+        """
+        Swap in a new catalog (e.g. after an ingestion batch) together with an empty response cache.
+
+        Safe to call from another thread: the index and its cache are replaced
+        in one assignment, and a request that started on the old index only
+        writes into the old cache.
+        """
+        self._state = (CatalogIndex(data), OrderedDict())
+
+    @property
+    def index(self) -> CatalogIndex:
+        return self._state[0]
+
+    @property
+    def cache(self) -> OrderedDict:
+        return self._state[1]
+
+    def _cache_key(self, path, params):
+        return path + '?' + '&'.join(f"{k}={v}" for k, v in sorted(params.items()))
+
+    def handle(self, target: str):
+        """Return (status, body bytes) for a request target such as `/events?min_mag=3`"""
+        url = urlsplit(target)
+        path = url.path.rstrip('/') or '/'
+        params = dict(parse_qsl(url.query))
+        cacheable = path in CACHED_PATHS or path.startswith('/faults/')
+        key = self._cache_key(path, params)
+        index, cache = self._state
+
+        if cacheable:
+            cached = cache.get(key)
+            if cached is not None:
+                cache.move_to_end(key)
+                self.cache_hits += 1
+                return cached
+            self.cache_misses += 1
+
+        try:
+            status, payload = self._route(index, cache, path, params)
+        except QueryError as e:
+            status, payload = 400, {'error': str(e)}
+        except Exception as e:
+            # Keep the connection (and the service) alive on unexpected failures
+            print(f"✗ Query failed {target}: {e!r}")
+            status, payload = 500, {'error': 'internal error'}
+        response = (status, encode(payload))
+
+        if status == 200 and cacheable:
+            cache[key] = response
+            if len(cache) > self.cache_size:
+                cache.popitem(last=False)
+        return response
+
+    def _route(self, index, cache, path, params):
+        if path == '/health':
+            return 200, {'events': index.size, 'faults': len(index.fault_stats),
+                         'cache_entries': len(cache), 'cache_hits': self.cache_hits,
+                         'cache_misses': self.cache_misses}
+        if path == '/events':
+            result = index.query(**parse_event_query(params))
+            return 200, {'total': result['total'], 'returned': len(result['rows']),
+                         'events': index.records(result['rows'])}
+        if path == '/faults':
+            stats = sorted(index.fault_stats.values(), key=lambda s: -s['event_count'])
+            return 200, {'faults': stats}
+        if path.startswith('/faults/'):
+            catalog_id = unquote(path[len('/faults/'):])
+            stats = index.fault_stats.get(catalog_id)
+            if stats is None:
+                return 404, {'error': f"unknown catalog_id {catalog_id}"}
+            return 200, stats
+        return 404, {'error': f"unknown path {path}"}
+
+    async def _client(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                try:
+                    method, target, version = request_line.decode('latin-1').split()
+                except ValueError:
+                    break
+                keep_alive = version == 'HTTP/1.1'
+                while True:
+                    header = await reader.readline()
+                    if header in (b'\r\n', b'\n', b''):
+                        break
+                    name, _, value = header.decode('latin-1').partition(':')
+                    if name.strip().lower() == 'connection':
+                        keep_alive = value.strip().lower() == 'keep-alive' or (
+                            keep_alive and value.strip().lower() != 'close')
+
+                if method != 'GET':
+                    status, body = 405, b'{"error": "only GET is supported"}'
+                else:
+                    status, body = self.handle(target)
+                reason = {200: 'OK', 400: 'Bad Request', 404: 'Not Found', 405: 'Method Not Allowed',
+                          500: 'Internal Server Error'}[status]
+                writer.write(
+                    f"HTTP/1.1 {status} {reason}\r\nContent-Type: application/json\r\n"
+                    f"Content-Length: {len(body)}\r\nConnection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n"
+                    .encode('latin-1') + body)
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (ConnectionResetError, BrokenPipeError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def serve(self, host: str = QUERY_HOST, port: int = QUERY_PORT, ready=None):
+        server = await asyncio.start_server(self._client, host, port, backlog=1024)
+        if ready is not None:
+            ready(server.sockets[0].getsockname()[1])
+        print(f"Query service listening on http://{host}:{server.sockets[0].getsockname()[1]}")
+        async with server:
+            await server.serve_forever()
+
+
+def serve_catalog(data: pd.DataFrame, host: str = QUERY_HOST, port: int = QUERY_PORT):
+    """Blocking helper: serve an enriched catalog until interrupted"""
+    asyncio.run(QueryService(data).serve(host, port))
+
+
+if __name__ == '__main__':
+    import modules.data_prep as data_prep
+
+    data, _, _ = data_prep.data_prep_pipeline()
+    serve_catalog(data)
@@ -0,0 +1,242 @@
+"""
+Pluggable readers that turn earthquake catalogs from different agencies into one event table.
+
+Every reader returns the columns produced by `EarthquakeAnalyzer.extract_data`
+(`timestamp`, `location`, `magnitude`, `latitude`, `longitude`, `depth`) plus
+`source`, `source_event_id` and `magnitude_type`. Timestamps of UTC catalogs
+are converted to Kandilli local time (`KANDILLI_TIMEZONE`) so that all
+sources share the time base the rest of the pipeline already uses.
+"""
+import os
+from xml.etree import ElementTree as ET
+import pandas as pd
+from modules.model import EarthquakeAnalyzer
+from modules.config import KANDILLI_TIMEZONE
+
+
+COLUMNS = ['timestamp', 'location', 'magnitude', 'latitude', 'longitude', 'depth',
+           'source', 'source_event_id', 'magnitude_type']
+
+TIMESTAMP_FORMAT = '%Y.%m.%d %H:%M:%S'
+
+
+def _utc_to_kandilli(times: pd.Series) -> pd.Series:
+    # The offset changed over the years (summer time until 2016), so convert by zone, not by a fixed offset
+    return pd.to_datetime(times, errors='coerce', utc=True).dt.tz_convert(KANDILLI_TIMEZONE).dt.tz_localize(None)
+
+
+def _finish(df: pd.DataFrame, source: str) -> pd.DataFrame:
+    """Fill the common columns, drop events without a magnitude and add `timestamp_dt`"""
+    df = df.copy()
+    df['source'] = source
+    for column in COLUMNS:
+        if column not in df.columns:
+            df[column] = None
+    for column in ('magnitude', 'latitude', 'longitude', 'depth'):
+        df[column] = pd.to_numeric(df[column], errors='coerce')
+    df['location'] = df['location'].fillna('').astype(str).str.strip()
+    df = df[df['magnitude'] > 0].reset_index(drop=True)
+    df['timestamp_dt'] = pd.to_datetime(df['timestamp'], format=TIMESTAMP_FORMAT, errors='coerce')
+    return df[COLUMNS + ['timestamp_dt']]
+
+
+class CatalogReader:
+    """Base class: subclasses set `source` and implement `can_read` and `read`"""
+    source = None
+
+    def can_read(self, path: str) -> bool:
+        raise NotImplementedError
+
+    def read(self, path: str) -> pd.DataFrame:
+        raise NotImplementedError
+
+
+class KandilliXMLReader(CatalogReader):
+    """Monthly Kandilli files with `earhquake` elements"""
+    source = 'kandilli'
+
+    def can_read(self, path: str) -> bool:
+        if not path.lower().endswith('.xml'):
+            return False
+        with open(path, 'rb') as f:
+            return b'<earhquake' in f.read(4096)
+
+    def read(self, path: str) -> pd.DataFrame:
+        frames = list(EarthquakeAnalyzer.iter_extract_data(path))
+        df = pd.concat(frames, ignore_index=True) if frames else pd.DataFrame(columns=COLUMNS)
+        df['source_event_id'] = None
+        df['magnitude_type'] = None
+        return _finish(df, self.source)
+
+
+class DelimitedReader(CatalogReader):
+    """
+    Delimited text exports described by a column mapping.
+
+    `columns` maps the file's header names to the common column names and
+    `header_marker` is a header name that identifies the format when sniffing.
+    """
+
+    def __init__(self, source: str, columns: dict, header_marker: str, sep: str = ','):
+        self.source = source
+        self.columns = columns
+        self.header_marker = header_marker
+        self.sep = sep
+
+    def _header(self, path: str) -> list:
+        with open(path, encoding='utf-8', errors='replace') as f:
+            first = f.readline().lstrip('#').strip()
+        return [h.strip() for h in first.split(self.sep)]
+
+    def can_read(self, path: str) -> bool:
+        if not path.lower().endswith(('.csv', '.txt', '.tsv')):
+            return False
+        return self.header_marker in self._header(path)
+
+    def read(self, path: str) -> pd.DataFrame:
+        header = self._header(path)
+        usecols = [c for c in self.columns if c in header]
+        df = pd.read_csv(path, sep=self.sep, header=0, names=header, usecols=usecols,
+                         dtype={c: str for c in usecols if self.columns[c] in ('timestamp', 'location', 'source_event_id', 'magnitude_type')},
+                         skipinitialspace=True)
+        df = df.rename(columns=self.columns)
+        df['timestamp'] = _utc_to_kandilli(df['timestamp']).dt.strftime(TIMESTAMP_FORMAT)
+        return _finish(df, self.source)
+
+
+USGS_CSV = DelimitedReader(
+    source='usgs',
+    columns={'time': 'timestamp', 'latitude': 'latitude', 'longitude': 'longitude', 'depth': 'depth',
+             'mag': 'magnitude', 'magType': 'magnitude_type', 'place': 'location', 'id': 'source_event_id'},
+    header_marker='magType',
+)
+
+# FDSN event "text" format, as served by EMSC (`#EventID|Time|Latitude|...`)
+EMSC_FDSN_TEXT = DelimitedReader(
+    source='emsc',
+    columns={'EventID': 'source_event_id', 'Time': 'timestamp', 'Latitude': 'latitude', 'Longitude': 'longitude',
+             'Depth/km': 'depth', 'MagType': 'magnitude_type', 'Magnitude': 'magnitude',
+             'EventLocationName': 'location'},
+    header_marker='EventLocationName',
+    sep='|',
+)
+
+# EMSC CSV exports use comma-separated columns with similar names
+EMSC_CSV = DelimitedReader(
+    source='emsc',
+    columns={'EventID': 'source_event_id', 'Time': 'timestamp', 'Latitude': 'latitude', 'Longitude': 'longitude',
+             'Depth': 'depth', 'MagType': 'magnitude_type', 'Magnitude': 'magnitude', 'Region': 'location'},
+    header_marker='Region',
+)
+
+
+class QuakeMLReader(CatalogReader):
+    """QuakeML 1.2 event parameters, streamed with iterparse and matched on local tag names"""
+    source = 'quakeml'
+
+    def can_read(self, path: str) -> bool:
+        if not path.lower().endswith(('.xml', '.qml', '.quakeml')):
+            return False
+        with open(path, 'rb') as f:
+            return b'quakeml' in f.read(4096).lower()
+
+    ORIGIN_FIELDS = {'time': 'timestamp', 'latitude': 'latitude', 'longitude': 'longitude', 'depth': 'depth'}
+    MAGNITUDE_FIELDS = {'mag': 'magnitude'}
+
+    @staticmethod
+    def _local(tag):
+        return tag[tag.rfind('}') + 1:]
+
+    def _quantities(self, element, fields: dict) -> dict:
+        """Read `<field><value>...</value></field>` children (plus `<type>`) of an origin/magnitude"""
+        values = {}
+        for child in element:
+            name = self._local(child.tag)
+            if name in fields:
+                for sub in child:
+                    if self._local(sub.tag) == 'value':
+                        values[fields[name]] = (sub.text or '').strip()
+                        break
+            elif name == 'type' and fields is self.MAGNITUDE_FIELDS:
+                values['magnitude_type'] = (child.text or '').strip()
+        return values
+
+    def _event_record(self, element) -> dict:
+        record = {'source_event_id': element.get('publicID')}
+        preferred = {}
+        origins, magnitudes = [], []
+        for child in element:
+            name = self._local(child.tag)
+            if name in ('preferredOriginID', 'preferredMagnitudeID'):
+                preferred[name] = (child.text or '').strip()
+            elif name == 'origin':
+                origins.append(child)
+            elif name == 'magnitude':
+                magnitudes.append(child)
+            elif name == 'description':
+                for sub in child:
+                    if self._local(sub.tag) == 'text':
+                        record.setdefault('location', (sub.text or '').strip())
+
+        for candidates, key, fields in ((origins, 'preferredOriginID', self.ORIGIN_FIELDS),
+                                        (magnitudes, 'preferredMagnitudeID', self.MAGNITUDE_FIELDS)):
+            chosen = next((c for c in candidates if c.get('publicID') == preferred.get(key)),
+                          candidates[0] if candidates else None)
+            if chosen is not None:
+                record.update(self._quantities(chosen, fields))
+        return record
+
+    def read(self, path: str) -> pd.DataFrame:
+        records = []
+        for _, element in ET.iterparse(path, events=('end',)):
+            tag = element.tag
+            if tag == 'event' or tag.endswith('}event'):
+                records.append(self._event_record(element))
+                element.clear()
+
+        df = pd.DataFrame.from_records(records, columns=[c for c in COLUMNS if c != 'source'])
+        # QuakeML depths are in meters
+        df['depth'] = pd.to_numeric(df['depth'], errors='coerce') / 1000.0
+        df['timestamp'] = _utc_to_kandilli(df['timestamp']).dt.strftime(TIMESTAMP_FORMAT)
+        return _finish(df, self.source)
+
+
+READERS = [KandilliXMLReader(), QuakeMLReader(), USGS_CSV, EMSC_FDSN_TEXT, EMSC_CSV]
+
+
+def register_reader(reader: CatalogReader, first: bool = True):
+    """Add a reader; by default it is tried before the built-in ones"""
+    if first:
+        READERS.insert(0, reader)
+    else:
+        READERS.append(reader)
+
+
+def get_reader(path: str) -> CatalogReader:
+    for reader in READERS:
+        try:
+            if reader.can_read(path):
+                return reader
+        except OSError:
+            continue
+    raise ValueError(f"No catalog reader recognises {path}")
+
+
+def read_catalogs(paths: list) -> pd.DataFrame:
+    """Read every file with the first matching reader and stack them into one table"""
+    frames = []
+    for path in paths:
+        if os.path.isdir(path):
+            frames.append(read_catalogs(sorted(os.path.join(path, f) for f in os.listdir(path))))
+            continue
+        try:
+            frame = get_reader(path).read(path)
+        except Exception as e:
+            print(f"Error parsing {path}: {e}")
+            continue
+        print(f"✓ {frame['source'].iloc[0] if len(frame) else 'empty'}: {len(frame)} events from {path}")
+        frames.append(frame)
+    frames = [f for f in frames if len(f)]
+    if not frames:
+        return pd.DataFrame(columns=COLUMNS + ['timestamp_dt'])
+    return pd.concat(frames, ignore_index=True)
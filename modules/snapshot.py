@@ -0,0 +1,188 @@
+"""
+Immutable, shareable snapshots of the enriched catalog.
+
+A snapshot is a directory of memory-mapped column arrays (see
+`modules.columnar`) plus a `manifest.json`. Snapshots are never modified
+once written: `publish_snapshot` writes a new one into a private temporary
+directory, renames it into place and only then repoints the `CURRENT` file,
+so readers always see either the previous or the new snapshot, complete.
+
+Worker processes attach with `Snapshot.attach()` (or receive a `Snapshot`,
+which pickles as its path). Attaching memory-maps every column file at once,
+so an attached snapshot stays readable after pruning deletes its directory
+(on POSIX systems). Numeric, datetime and categorical columns are
+read-only memory maps of the same files, so every process shares one copy of
+the catalog through the page cache. Low-cardinality text columns are stored
+as categoricals for that reason; free text and nested columns are decoded
+per process on access.
+"""
+import json
+import os
+import shutil
+import threading
+import uuid
+from datetime import datetime
+import pandas as pd
+from modules.columnar import write_columns, open_column, decode_column, _write_json_atomic
+from modules.config import SNAPSHOT_PATH, SNAPSHOT_KEEP, SNAPSHOT_CATEGORY_MAX_RATIO
+
+
+MANIFEST = 'manifest.json'
+CURRENT = 'CURRENT'
+PREFIX = 'snapshot-'
+
+
+def _as_categories(data: pd.DataFrame, max_ratio: float = SNAPSHOT_CATEGORY_MAX_RATIO) -> pd.DataFrame:
+    """Store text columns with few distinct values (city, catalog_id, slip_type, ...) as categoricals"""
+    converted = {}
+    for column in data.columns:
+        series = data[column]
+        if not (pd.api.types.is_object_dtype(series) or pd.api.types.is_string_dtype(series)):
+            continue
+        sample = series.dropna()
+        if len(sample) and not all(isinstance(v, str) for v in sample.iloc[:100]):
+            continue
+        if series.nunique(dropna=True) <= max_ratio * max(len(series), 1):
+            converted[column] = series.astype('category')
+    return data.assign(**converted) if converted else data
+
+
+def _read_current(root: str):
+    try:
+        with open(os.path.join(root, CURRENT), encoding='utf-8') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+
+def _point_current_to_newest(root: str):
+    """
+    Repoint CURRENT to the newest snapshot directory.
+
+    Every publisher does this after its rename, and the newest version only
+    grows, so whichever publisher writes last leaves CURRENT on the newest.
+    """
+    while True:
+        newest = max(n for n in os.listdir(root) if n.startswith(PREFIX))
+        _write_json_atomic(os.path.join(root, CURRENT), {'version': int(newest[len(PREFIX):]), 'name': newest})
+        if max(n for n in os.listdir(root) if n.startswith(PREFIX)) == newest:
+            return
+
+
+def publish_snapshot(data: pd.DataFrame, root: str = SNAPSHOT_PATH, metadata: dict = None,
+                     keep: int = SNAPSHOT_KEEP) -> 'Snapshot':
+    """Write `data` as a new snapshot, make it current atomically and prune old snapshots"""
+    os.makedirs(root, exist_ok=True)
+    data = _as_categories(data.reset_index(drop=True))
+    tmp_dir = os.path.join(root, f".tmp-{uuid.uuid4().hex}")
+    schema = write_columns(tmp_dir, data)
+
+    current = _read_current(root)
+    version = (current or {}).get('version', 0) + 1
+    while True:
+        name = f"{PREFIX}{version:06d}"
+        manifest = {'version': version, 'rows': int(len(data)), 'schema': schema,
+                    'created': datetime.now().isoformat(timespec='seconds'), 'metadata': metadata or {}}
+        _write_json_atomic(os.path.join(tmp_dir, MANIFEST), manifest)
+        try:
+            # Renaming onto an existing snapshot fails, so concurrent publishers get distinct versions
+            os.rename(tmp_dir, os.path.join(root, name))
+            break
+        except OSError:
+            if not os.path.exists(os.path.join(root, name)):
+                raise
+            version += 1
+
+    _point_current_to_newest(root)
+    prune_snapshots(root, keep)
+    print(f"✓ Published {name}: {len(data)} events")
+    return Snapshot(os.path.join(root, name))
+
+
+def prune_snapshots(root: str = SNAPSHOT_PATH, keep: int = SNAPSHOT_KEEP):
+    """
+    Delete all but the newest `keep` snapshots (never the current one).
+
+    `Snapshot` objects created before the deletion keep working on POSIX
+    systems: they mapped every column file when they were created, and open
+    memory maps outlive the files. A deleted snapshot cannot be attached
+    again, and on Windows the directory of an attached snapshot is not removed.
+    """
+    current = (_read_current(root) or {}).get('name')
+    names = sorted(n for n in os.listdir(root) if n.startswith(PREFIX))
+    for name in names[:max(len(names) - keep, 0)]:
+        if name != current:
+            shutil.rmtree(os.path.join(root, name), ignore_errors=True)
+
+
+class Snapshot:
+    """Read-only view of one published snapshot; columns are decoded once and shared between threads"""
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(os.path.join(path, MANIFEST), encoding='utf-8') as f:
+            self.manifest = json.load(f)
+        # Map every file now, so pruning the directory later does not break columns not yet accessed
+        self._arrays = {name: open_column(path, spec, mmap=True) for name, spec in self.manifest['schema'].items()}
+        self._columns = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def attach(cls, root: str = SNAPSHOT_PATH) -> 'Snapshot':
+        """The current snapshot under `root`"""
+        current = _read_current(root)
+        if current is None:
+            raise FileNotFoundError(f"No snapshot has been published under {root}")
+        return cls(os.path.join(root, current['name']))
+
+    def __reduce__(self):
+        # Workers re-attach by path instead of receiving a pickled copy of the data
+        return Snapshot, (self.path,)
+
+    def __len__(self):
+        return self.manifest['rows']
+
+    @property
+    def version(self) -> int:
+        return self.manifest['version']
+
+    @property
+    def metadata(self) -> dict:
+        return self.manifest['metadata']
+
+    @property
+    def columns(self) -> list:
+        return list(self.manifest['schema'])
+
+    def column(self, name: str):
+        """One column as a read-only memory map (numeric/datetime), Categorical, or decoded object array"""
+        values = self._columns.get(name)
+        if values is None:
+            with self._lock:
+                values = self._columns.get(name)
+                if values is None:
+                    values = self._columns[name] = decode_column(self.manifest['schema'][name], self._arrays[name])
+        return values
+
+    def frame(self, columns: list = None) -> pd.DataFrame:
+        """DataFrame over the snapshot columns without copying the memory-mapped ones"""
+        columns = self.columns if columns is None else columns
+        return pd.DataFrame({c: pd.Series(self.column(c), copy=False) for c in columns}, copy=False)
+
+
+class SnapshotReader:
+    """Hands out the current snapshot, re-attaching when a newer one has been published"""
+
+    def __init__(self, root: str = SNAPSHOT_PATH):
+        self.root = root
+        self._snapshot = None
+        self._lock = threading.Lock()
+
+    def current(self) -> Snapshot:
+        latest = _read_current(self.root)
+        with self._lock:
+            if latest is None and self._snapshot is None:
+                raise FileNotFoundError(f"No snapshot has been published under {self.root}")
+            if latest is not None and (self._snapshot is None or self._snapshot.version != latest['version']):
+                self._snapshot = Snapshot(os.path.join(self.root, latest['name']))
+            return self._snapshot
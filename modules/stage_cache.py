@@ -0,0 +1,172 @@
+"""
+Deterministic on-disk cache for the stages of `data_prep_pipeline`.
+
+Each stage is identified by a fingerprint: a hash of its name, an explicit
+version, the source code of the functions it runs, the values of the inputs
+it depends on (file sizes and modification times, config values, ...) and
+the fingerprints of the upstream stages it consumes. When the fingerprint is
+already in the cache the stored output is returned instead of recomputing,
+so changing a setting only reruns the stages that actually read it.
+
+Outputs may be DataFrames (stored with `modules.columnar`), JSON-serialisable
+values, or tuples of those. Entries are written to a temporary directory and
+renamed into place, so an interrupted run never leaves a half-written entry.
+"""
+import hashlib
+import inspect
+import json
+import os
+import shutil
+import uuid
+from datetime import datetime
+import pandas as pd
+from modules.columnar import write_columns, read_columns, _write_json_atomic
+from modules.config import STAGE_CACHE_PATH, STAGE_CACHE_ENABLED, STAGE_CACHE_KEEP_PER_STAGE
+
+
+META = 'meta.json'
+INDEX_COLUMN = '__index__'
+
+
+def _code_hash(functions) -> str:
+    digest = hashlib.sha256()
+    for function in functions:
+        try:
+            source = inspect.getsource(function)
+        except (OSError, TypeError):
+            source = getattr(function, '__qualname__', repr(function))
+        digest.update(source.encode('utf-8'))
+    return digest.hexdigest()
+
+
+def fingerprint(stage: str, version: int = 1, inputs: dict = None, code=(), upstream=()) -> str:
+    """Stable hash of everything a stage's output depends on"""
+    payload = {'stage': stage, 'version': version, 'inputs': inputs or {}, 'code': _code_hash(code),
+               'upstream': list(upstream)}
+    return hashlib.sha256(json.dumps(payload, sort_keys=True, default=str).encode('utf-8')).hexdigest()
+
+
+def file_fingerprint(path: str):
+    """(path, size, mtime) of a file, or None when it does not exist"""
+    if not os.path.exists(path):
+        return None
+    stat = os.stat(path)
+    return [os.path.abspath(path), stat.st_size, int(stat.st_mtime_ns)]
+
+
+def _save_item(directory: str, name: str, value) -> dict:
+    if isinstance(value, pd.DataFrame):
+        frame = value
+        index_name = value.index.name
+        keep_index = not (isinstance(value.index, pd.RangeIndex) and value.index.start == 0 and value.index.step == 1)
+        if keep_index:
+            frame = value.reset_index(names=INDEX_COLUMN)
+        else:
+            frame = value.reset_index(drop=True)
+        schema = write_columns(os.path.join(directory, name), frame)
+        # Column files keep the values, not every pandas dtype (e.g. Int64 without missing values reads back as int64)
+        dtypes = {str(c): str(t) for c, t in frame.dtypes.items()}
+        return {'type': 'frame', 'name': name, 'schema': schema, 'index': keep_index, 'index_name': index_name,
+                'dtypes': dtypes}
+    with open(os.path.join(directory, f"{name}.json"), 'w', encoding='utf-8') as f:
+        json.dump(value, f)
+    return {'type': 'json', 'name': name}
+
+
+def _load_item(directory: str, spec: dict):
+    if spec['type'] == 'frame':
+        frame = read_columns(os.path.join(directory, spec['name']), spec['schema'], mmap=False)
+        dtypes = spec.get('dtypes', {})
+        restore = {c: dtypes[str(c)] for c in frame.columns
+                   if str(c) in dtypes and str(frame[c].dtype) != dtypes[str(c)]}
+        if restore:
+            frame = frame.astype(restore)
+        if spec['index']:
+            frame = frame.set_index(INDEX_COLUMN)
+            frame.index.name = spec['index_name']
+        return frame
+    with open(os.path.join(directory, f"{spec['name']}.json"), encoding='utf-8') as f:
+        return json.load(f)
+
+
+class StageCache:
+    """Stage outputs stored under `path/<stage>/<fingerprint>/`"""
+
+    def __init__(self, path: str = STAGE_CACHE_PATH, enabled: bool = STAGE_CACHE_ENABLED,
+                 keep_per_stage: int = STAGE_CACHE_KEEP_PER_STAGE):
+        self.path = path
+        self.enabled = enabled
+        self.keep_per_stage = keep_per_stage
+        self.hits, self.misses = [], []
+
+    def _entry(self, stage: str, key: str) -> str:
+        return os.path.join(self.path, stage, key)
+
+    def load(self, stage: str, key: str):
+        """Stored output of `stage` for `key`; raises KeyError when there is none"""
+        entry = self._entry(stage, key)
+        try:
+            with open(os.path.join(entry, META), encoding='utf-8') as f:
+                meta = json.load(f)
+        except FileNotFoundError:
+            raise KeyError(key) from None
+        items = [_load_item(entry, spec) for spec in meta['items']]
+        # Touch the entry so pruning keeps recently used outputs
+        os.utime(os.path.join(entry, META))
+        return tuple(items) if meta['tuple'] else items[0]
+
+    def store(self, stage: str, key: str, value, inputs: dict = None):
+        entry = self._entry(stage, key)
+        tmp = os.path.join(self.path, stage, f".tmp-{uuid.uuid4().hex}")
+        os.makedirs(tmp)
+        values = value if isinstance(value, tuple) else (value,)
+        items = [_save_item(tmp, f"item{i}", v) for i, v in enumerate(values)]
+        _write_json_atomic(os.path.join(tmp, META), {
+            'stage': stage, 'key': key, 'created': datetime.now().isoformat(timespec='seconds'),
+            'inputs': inputs or {}, 'tuple': isinstance(value, tuple), 'items': items})
+        try:
+            os.rename(tmp, entry)
+        except OSError:
+            # Another process stored the same entry first; the outputs are identical
+            shutil.rmtree(tmp, ignore_errors=True)
+        self.prune(stage)
+
+    def prune(self, stage: str):
+        """Keep the `keep_per_stage` most recently used entries of `stage`"""
+        stage_dir = os.path.join(self.path, stage)
+        entries = []
+        for name in os.listdir(stage_dir):
+            meta = os.path.join(stage_dir, name, META)
+            if not name.startswith('.') and os.path.exists(meta):
+                entries.append((os.path.getmtime(meta), name))
+        for _, name in sorted(entries, reverse=True)[self.keep_per_stage:]:
+            shutil.rmtree(os.path.join(stage_dir, name), ignore_errors=True)
+
+    def run(self, stage: str, compute, inputs: dict = None, code=(), upstream=(), version: int = 1,
+            validate=None) -> tuple:
+        """
+        Return `(output, fingerprint)` of a stage, computing it only on a cache miss.
+
+        `validate(output)` can reject a stored output (e.g. when files it
+        lists were deleted), which recomputes the stage.
+        """
+        key = fingerprint(stage, version, inputs, code, upstream)
+        if self.enabled:
+            try:
+                value = self.load(stage, key)
+                if validate is None or validate(value):
+                    print(f"✓ {stage}: reused cached output ({key[:12]})")
+                    self.hits.append(stage)
+                    return value, key
+            except (KeyError, OSError, ValueError) as e:
+                if not isinstance(e, KeyError):
+                    print(f"✗ {stage}: unreadable cache entry, recomputing ({e})")
+
+        value = compute()
+        self.misses.append(stage)
+        if self.enabled:
+            self.store(stage, key, value, inputs)
+        return value, key
+
+    def clear(self, stage: str = None):
+        shutil.rmtree(os.path.join(self.path, stage) if stage else self.path, ignore_errors=True)
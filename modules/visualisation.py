@@ -1,7 +1,3 @@
-import folium
-from folium.plugins import MarkerCluster
-import branca.colormap as cm
-from branca.element import Template, MacroElement
 from collections import Counter
 from datetime import datetime
 import json
@@ -9,6 +5,11 @@ import os
 from modules.config import START_MONTH, START_YEAR, END_MONTH, END_YEAR, HIGH_MAG_THRESHOLD, MAP_MODE
 
 def generate_map(data, filtered_features, gj, high_mag_threshold):
+    import folium
+    from folium.plugins import MarkerCluster
+    import branca.colormap as cm
+    from branca.element import Template, MacroElement
+
     faults_features = filtered_features if filtered_features else (gj.get('features', []) if gj else [])
 
     if not data.empty and 'latitude' in data.columns and 'longitude' in data.columns:
@@ -239,6 +240,10 @@ def generate_map(data, filtered_features, gj, high_mag_threshold):
 
 
 def generate_basic_map(data, filtered_features, gj, high_mag_threshold):
+    import folium
+    from folium.plugins import MarkerCluster
+    import branca.colormap as cm
+
     faults_features = filtered_features if filtered_features else (gj.get('features', []) if gj else [])
     faults_fc = {'type': 'FeatureCollection', 'features': faults_features}
 
@@ -313,9 +318,6 @@ def generate_basic_map(data, filtered_features, gj, high_mag_threshold):
 
 
 
-import ipywidgets
-from IPython.display import display
-
 def generate_alt_map(data, filtered_features, gj, high_mag_threshold, return_widgets=False):
     """
     Build a folium.Map (not displayed) and optionally return widgets for interactive use in a notebook.
@@ -324,6 +326,10 @@ def generate_alt_map(data, filtered_features, gj, high_mag_threshold, return_wid
     - If return_widgets is True returns a dict: {'map': folium.Map, 'dropdown': ipywidget.Dropdown, 'out_widget': ipywidgets.Output, 'build_map': callable}
       so the caller can display widgets in a notebook and still obtain the map later.
     """
+    import folium
+    from folium.plugins import MarkerCluster
+    import branca.colormap as cm
+
     faults_features = filtered_features if filtered_features else (gj.get('features', []) if gj else [])
 
     faults_by_catalog = {}
@@ -462,6 +468,9 @@ def generate_alt_map(data, filtered_features, gj, high_mag_threshold, return_wid
         return m
 
     if return_widgets:
+        import ipywidgets
+        from IPython.display import display
+
         out_map = ipywidgets.Output(layout={'border': '1px solid black', 'height': '600px'})
         catalog_options = ['All'] + sorted(list(faults_by_catalog.keys()))
         fault_dropdown = ipywidgets.Dropdown(
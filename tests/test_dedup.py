@@ -0,0 +1,80 @@
+"""Bucketed candidate search and one-to-one matching versus brute force"""
+import numpy as np
+import pandas as pd
+import pytest
+
+from modules.dedup import candidate_pairs, match_one_to_one, deduplicate_events, _haversine_km
+
+
+def _all_pairs_within(times_s, lat, lng, time_tol_s, dist_tol_km):
+    i, j = np.triu_indices(len(times_s), k=1)
+    close = ((np.abs(times_s[i] - times_s[j]) <= time_tol_s)
+             & (_haversine_km(lat[i], lng[i], lat[j], lng[j]) <= dist_tol_km))
+    return set(zip(i[close].tolist(), j[close].tolist()))
+
+
+def _greedy_groups(rank, left, right, score):
+    """Reference for `match_one_to_one`: per source, take the closest (row, group) pairs first"""
+    group = [-1] * len(rank)
+    next_group = 0
+    for r in sorted(set(rank.tolist())):
+        best = {}
+        for a, b, s in zip(np.r_[left, right], np.r_[right, left], np.r_[score, score]):
+            if rank[a] == r and group[b] >= 0:
+                key = (int(a), group[b])
+                best[key] = min(best.get(key, np.inf), s)
+        used_rows, used_groups = set(), set()
+        for (a, g), _ in sorted(best.items(), key=lambda item: item[1]):
+            if a not in used_rows and g not in used_groups:
+                group[a] = g
+                used_rows.add(a)
+                used_groups.add(g)
+        for a in np.flatnonzero(rank == r):
+            if group[a] < 0:
+                group[a] = next_group
+                next_group += 1
+    return np.array(group)
+
+
+@pytest.mark.parametrize('centre_lat', [39.0, 70.0])
+def test_candidate_pairs_cover_all_close_pairs(centre_lat):
+    rng = np.random.default_rng(0)
+    n = 2000
+    times_s = rng.uniform(0, 3600, n)
+    lat = centre_lat + rng.uniform(-2, 2, n)
+    lng = 30 + rng.uniform(-3, 3, n)
+
+    left, right = candidate_pairs(times_s, lat, lng, 16, 30)
+    found = set(zip(left.tolist(), right.tolist()))
+    assert len(found) == len(left)
+    assert _all_pairs_within(times_s, lat, lng, 16, 30) <= found
+
+
+@pytest.mark.parametrize('n_sources', [2, 3])
+def test_match_one_to_one_matches_greedy(n_sources):
+    rng = np.random.default_rng(n_sources)
+    n = 300
+    rank = rng.integers(0, n_sources, n)
+    left, right = np.triu_indices(n, k=1)
+    pick = (rng.random(len(left)) < 0.02) & (rank[left] != rank[right])
+    left, right = left[pick], right[pick]
+    score = rng.random(len(left))
+
+    group = match_one_to_one(rank, left, right, score)
+    np.testing.assert_array_equal(group, _greedy_groups(rank, left, right, score))
+    # No group holds two rows of one source
+    assert not pd.DataFrame({'group': group, 'rank': rank}).duplicated().any()
+
+
+def test_same_source_neighbours_are_not_collapsed():
+    times = pd.to_datetime(['2025-01-01 00:00:00', '2025-01-01 00:00:10', '2025-01-01 00:00:02'])
+    data = pd.DataFrame({
+        'timestamp_dt': times,
+        'latitude': [39.0, 39.01, 39.0],
+        'longitude': [30.0, 30.01, 30.0],
+        'magnitude': [3.0, 3.1, 3.0],
+        'source': ['kandilli', 'kandilli', 'usgs'],
+    })
+    kept = deduplicate_events(data)
+    assert kept['source'].tolist() == ['kandilli', 'kandilli']
+    assert kept['n_sources'].tolist() == [2, 1]
@@ -0,0 +1,47 @@
+"""KD-tree nearest fault plane versus a scan over every segment"""
+import numpy as np
+import pandas as pd
+import pytest
+
+import modules.fault_geometry as fault_geometry
+from modules.data_prep import features_to_dataframe
+from modules.fault_geometry import FaultPlanes, calculate_3d_distance_to_fault
+from benchmarks.synthetic import generate_fault_features, REGION_LAT, REGION_LNG
+
+
+@pytest.fixture(scope='module')
+def features_df():
+    return features_to_dataframe(generate_fault_features(300, seed=3, outside_fraction=0))
+
+
+def _events(n, seed=0):
+    rng = np.random.default_rng(seed)
+    return rng.uniform(*REGION_LAT, n), rng.uniform(*REGION_LNG, n), rng.uniform(0, 40, n)
+
+
+@pytest.mark.parametrize('nearest_segments', [1, 8])
+def test_closest_matches_full_scan(features_df, monkeypatch, nearest_segments):
+    monkeypatch.setattr(fault_geometry, 'FAULT_3D_NEAREST_SEGMENTS', nearest_segments)
+    planes = FaultPlanes(features_df)
+    lat, lng, depth = _events(500)
+
+    rows, dist = planes.closest(lat, lng, depth)
+
+    ev = np.repeat(np.arange(len(lat)), len(planes))
+    seg = np.tile(np.arange(len(planes)), len(lat))
+    full = planes.pair_distances(lat[ev], lng[ev], depth[ev], seg).reshape(len(lat), len(planes))
+    np.testing.assert_allclose(dist, full.min(axis=1))
+    np.testing.assert_array_equal(rows, planes.segment_fault[full.argmin(axis=1)])
+
+
+def test_distance_columns(features_df):
+    lat, lng, depth = _events(50, seed=1)
+    data = pd.DataFrame({'latitude': lat, 'longitude': lng, 'depth': depth})
+    data.loc[0, 'latitude'] = np.nan
+
+    out = calculate_3d_distance_to_fault(features_df, data)
+    assert out['closest_fault_3d_idx'].isna().tolist() == [True] + [False] * 49
+    assert np.isnan(out.loc[0, 'distance_to_fault_3d_km'])
+    assert (out['distance_to_fault_3d_km'][1:] >= 0).all()
+    ids = features_df['catalog_id'].reindex(out['closest_fault_3d_idx'][1:].astype(int)).tolist()
+    assert out['closest_fault_3d_catalog_id'][1:].tolist() == ids
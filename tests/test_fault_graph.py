@@ -0,0 +1,73 @@
+"""Fault graph edges versus an all-pairs piece search, and exact-hop propagation"""
+import numpy as np
+import pytest
+
+from modules.data_prep import features_to_dataframe
+from modules.fault_geometry import trace_segments
+from modules.fault_graph import FaultGraph, build_fault_graph, segment_distances, _split_segments
+from benchmarks.synthetic import generate_fault_features
+
+
+def _edges(graph):
+    src = np.repeat(np.arange(graph.num_faults), graph.degree)
+    return {(int(a), int(b)): float(d) for a, b, d in zip(src, graph.indices, graph.distance_km)}
+
+
+@pytest.mark.parametrize('threshold_km', [2.0, 5.0])
+def test_edges_match_all_pairs(threshold_km):
+    features_df = features_to_dataframe(generate_fault_features(250, seed=4, outside_fraction=0))
+    graph = build_fault_graph(features_df, threshold_km=threshold_km, max_piece_km=5.0)
+
+    fault, lng0, lat0, lng1, lat1 = _split_segments(*trace_segments(features_df), 5.0)
+    i, j = np.triu_indices(len(fault), k=1)
+    other = fault[i] != fault[j]
+    i, j = i[other], j[other]
+    dist = segment_distances(lng0, lat0, lng1, lat1, i, j)
+    expected = {}
+    for a, b, d in zip(fault[i], fault[j], dist):
+        if d <= threshold_km:
+            for key in ((int(a), int(b)), (int(b), int(a))):
+                expected[key] = min(expected.get(key, np.inf), d)
+
+    edges = _edges(graph)
+    assert edges.keys() == expected.keys()
+    np.testing.assert_allclose([edges[k] for k in expected], list(expected.values()), rtol=1e-6, atol=1e-4)
+
+
+def _random_graph(n, p, seed):
+    rng = np.random.default_rng(seed)
+    adjacency = np.triu(rng.random((n, n)) < p, k=1)
+    adjacency |= adjacency.T
+    distance = np.triu(rng.uniform(0, 5, (n, n)), k=1)
+    distance += distance.T
+    src, dst = np.nonzero(adjacency)
+    indptr = np.r_[0, np.cumsum(adjacency.sum(axis=1))]
+    graph = FaultGraph(indptr, dst, distance[src, dst], np.arange(n), [f"F{k}" for k in range(n)], 5.0)
+    return graph, np.where(adjacency, np.exp(-distance.astype(np.float32).astype(float) / 5.0), 0.0)
+
+
+def test_propagate_reaches_each_fault_once():
+    graph, weights = _random_graph(40, 0.08, seed=5)
+    hops, decay = 3, 0.5
+    scores = np.random.default_rng(6).uniform(0, 10, graph.num_faults)
+
+    expected = np.zeros((hops + 1, graph.num_faults))
+    expected[0] = scores
+    for node in range(graph.num_faults):
+        reached = graph.k_hop_neighbours(node, hops)
+        # Sum of weight products over shortest paths, one hop layer at a time
+        paths = {node: 1.0}
+        for hop in range(1, hops + 1):
+            layer = [n for n, h in reached.items() if h == hop]
+            paths.update((n, sum(paths[m] * weights[m, n] for m, h in reached.items() if h == hop - 1))
+                         for n in layer)
+            expected[hop, node] = decay ** hop * sum(paths[n] * scores[n] for n in layer)
+
+    np.testing.assert_allclose(graph.propagate(scores, hops, decay), expected)
+
+
+def test_own_activity_is_not_returned_at_hop_two():
+    graph = FaultGraph([0, 1, 2], [1, 0], [0.0, 0.0], [0, 1], ['A', 'B'], 5.0)
+    per_hop = graph.propagate(np.array([1.0, 0.0]), hops=2, decay=0.5)
+    np.testing.assert_allclose(per_hop[:, 0], [1.0, 0.0, 0.0])
+    np.testing.assert_allclose(per_hop[:, 1], [0.0, 0.5, 0.0])